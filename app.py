@@ -11,15 +11,56 @@ YouTube Downloader Flask Application - Main Entry Point
 """
 
 import os
-from flask import Flask
+import gzip
+from flask import Flask, request, current_app
 from flask_cors import CORS
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
 from models import db
 from routes import register_blueprints
+from utils import UploadRequest, cache
 import config
 
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """为每个新建的SQLite连接设置性能相关的PRAGMA"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.execute('PRAGMA mmap_size=268435456')
+    cursor.execute('PRAGMA cache_size=-64000')
+    cursor.close()
+
+def _gzip_response(response):
+    """客户端支持gzip时压缩较大的JSON响应（任务列表等）"""
+    if (response.mimetype != 'application/json'
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or not request.accept_encodings['gzip']):
+        return response
+    
+    data = response.get_data()
+    if len(data) < current_app.config['COMPRESS_MIN_SIZE']:
+        return response
+    
+    response.set_data(gzip.compress(data, compresslevel=6))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+def _ensure_dirs():
+    """确保下载目录、上传临时目录和instance目录（SQLite数据库存放处）存在"""
+    for path in (config.DOWNLOAD_FOLDER, config.TEMP_UPLOAD_FOLDER,
+                 os.path.join(config.BASE_DIR, 'instance')):
+        os.makedirs(path, exist_ok=True)
+
+# 模块导入时执行一次，不在每次create_app时重复检查（gunicorn --preload 下只在主进程执行）
+_ensure_dirs()
+
 def create_app():
     """Create and configure the Flask application"""
     app = Flask(__name__)
+    app.request_class = UploadRequest
     
     # 启用CORS，允许跨域请求 - 特别是允许Chrome扩展
     CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
@@ -27,29 +68,39 @@ def create_app():
     # 加载配置
     app.config['SQLALCHEMY_DATABASE_URI'] = config.SQLALCHEMY_DATABASE_URI
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = config.SQLALCHEMY_TRACK_MODIFICATIONS
+    # 使用连接池复用SQLite连接，避免每个请求都重新打开数据库文件
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'poolclass': QueuePool,
+        'pool_size': 5,
+        'max_overflow': 10,
+        'pool_pre_ping': False,
+        'connect_args': {'check_same_thread': False}
+    }
     app.config['DOWNLOAD_FOLDER'] = config.DOWNLOAD_FOLDER
     app.config['MAX_CONTENT_LENGTH'] = config.MAX_CONTENT_LENGTH
     app.config['CHUNK_SIZE'] = config.CHUNK_SIZE
     app.config['STORAGE_LIMIT'] = config.STORAGE_LIMIT
     app.config['TEMP_UPLOAD_FOLDER'] = config.TEMP_UPLOAD_FOLDER
     app.config['SUBTITLES_PER_PAGE'] = config.SUBTITLES_PER_PAGE
-    
-    # 确保目录存在
-    if not os.path.exists(app.config['DOWNLOAD_FOLDER']):
-        os.makedirs(app.config['DOWNLOAD_FOLDER'])
-    
-    if not os.path.exists(app.config['TEMP_UPLOAD_FOLDER']):
-        os.makedirs(app.config['TEMP_UPLOAD_FOLDER'])
-    
-    # 确保instance目录存在 - 这是SQLite数据库存放的地方
-    instance_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
-    if not os.path.exists(instance_path):
-        os.makedirs(instance_path)
+    app.config['LONG_POLL_TIMEOUT'] = config.LONG_POLL_TIMEOUT
+    app.config['CACHE_TYPE'] = config.CACHE_TYPE
+    app.config['CACHE_DEFAULT_TIMEOUT'] = config.CACHE_DEFAULT_TIMEOUT
+    app.config['COMPRESS_MIN_SIZE'] = config.COMPRESS_MIN_SIZE
     
     # 初始化数据库
     db.init_app(app)
     with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            # WAL模式允许读写并发，synchronous=NORMAL在WAL下每次提交无需fsync
+            event.listen(db.engine, 'connect', _set_sqlite_pragmas)
         db.create_all()
+        # create_all 不会为已存在的表补建索引，逐个检查并补建（CREATE INDEX IF NOT EXISTS）
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=db.engine, checkfirst=True)
+    
+    # 初始化页面查询缓存
+    cache.init_app(app)
     
     # 注册蓝图
     register_blueprints(app)
@@ -60,7 +111,7 @@ def create_app():
         response.headers.add('Access-Control-Allow-Origin', '*')
         response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
         response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
-        return response
+        return _gzip_response(response)
     
     return app
 
@@ -25,4 +25,14 @@ CHUNK_SIZE = 10 * 1024 * 1024  # 10MB
 STORAGE_LIMIT = 50 * 1024 * 1024 * 1024  # 50GB
 
 # Pagination settings
-SUBTITLES_PER_PAGE = 40
\ No newline at end of file
+SUBTITLES_PER_PAGE = 40
+
+# Page cache settings (in-process cache for the index and subtitle list queries)
+CACHE_TYPE = 'SimpleCache'
+CACHE_DEFAULT_TIMEOUT = 5  # seconds
+
+# Response compression settings
+COMPRESS_MIN_SIZE = 1024  # JSON responses smaller than this (bytes) are sent uncompressed
+
+# Long-polling settings
+LONG_POLL_TIMEOUT = 25  # seconds a /api/tasks/new request waits for a new task
@@ -4,16 +4,28 @@ Database models for YouTube Downloader Flask Application
 
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, UTC
-from flask import url_for
+from urllib.parse import quote
+from flask import url_for, g
 
 db = SQLAlchemy()
 
+def format_datetime(value):
+    """格式化为 YYYY-MM-DD HH:MM:SS；isoformat 比 strftime 快，截取前19位去掉可能的时区后缀"""
+    return value.isoformat(sep=' ', timespec='seconds')[:19] if value else None
+
+def _download_url(filename):
+    """构建文件下载地址，每个请求只解析一次 url_for，之后直接拼接文件名"""
+    base = g.get('download_base')
+    if base is None:
+        base = g.download_base = url_for('main.download_file', filename='__x__').rsplit('__x__', 1)[0]
+    return base + quote(filename, safe="!$&'()*+,/:;=@")  # 与 werkzeug 路由转换器的转义规则一致
+
 class SubtitleContent(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     youtube_url = db.Column(db.String(255), nullable=False)
     audio_filename = db.Column(db.String(255))
     subtitle_filename = db.Column(db.String(255))
-    status = db.Column(db.String(50), default='pending')  # pending, processing, completed, failed, expired
+    status = db.Column(db.String(50), default='pending', index=True)  # pending, processing, completed, failed, expired
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
     completed_at = db.Column(db.DateTime)
     error_message = db.Column(db.Text)
@@ -27,19 +39,19 @@ class SubtitleContent(db.Model):
             'audio_filename': self.audio_filename,
             'subtitle_filename': self.subtitle_filename,
             'status': self.status,
-            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None,
-            'completed_at': self.completed_at.strftime('%Y-%m-%d %H:%M:%S') if self.completed_at else None,
+            'created_at': format_datetime(self.created_at),
+            'completed_at': format_datetime(self.completed_at),
             'error_message': self.error_message,
             'title': self.title,
             'description': self.description,
-            'audio_url': url_for('main.download_file', filename=self.audio_filename) if self.audio_filename else None,
-            'subtitle_url': url_for('main.download_file', filename=self.subtitle_filename) if self.subtitle_filename else None
+            'audio_url': _download_url(self.audio_filename) if self.audio_filename else None,
+            'subtitle_url': _download_url(self.subtitle_filename) if self.subtitle_filename else None
         }
 
 class TaskRequest(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     youtube_url = db.Column(db.String(255), nullable=False)
-    status = db.Column(db.String(50), default='pending')  # pending, processing, completed, failed
+    status = db.Column(db.String(50), default='pending', index=True)  # pending, processing, completed, failed
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
     processed_at = db.Column(db.DateTime)
     client_id = db.Column(db.String(100))  # 记录哪个客户端处理了这个任务
@@ -50,8 +62,14 @@ class TaskRequest(db.Model):
             'id': self.id,
             'youtube_url': self.youtube_url,
             'status': self.status,
-            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None,
-            'processed_at': self.processed_at.strftime('%Y-%m-%d %H:%M:%S') if self.processed_at else None,
+            'created_at': format_datetime(self.created_at),
+            'processed_at': format_datetime(self.processed_at),
             'client_id': self.client_id,
             'result_task_id': self.result_task_id
-        }
\ No newline at end of file
+        }
+
+# 字幕列表和过期清理按状态过滤并按完成时间排序，首页按创建时间倒序
+db.Index('ix_subtitle_status_completed', SubtitleContent.status, SubtitleContent.completed_at.desc())
+db.Index('ix_subtitle_created_at', SubtitleContent.created_at.desc())
+# 提交任务时按URL查重
+db.Index('ix_taskrequest_url', TaskRequest.youtube_url)
\ No newline at end of file
@@ -3,35 +3,78 @@ API routes for YouTube Downloader Flask Application
 """
 
 from flask import Blueprint, request, jsonify, current_app
-from models import db, SubtitleContent, TaskRequest
+from sqlalchemy import select, update, func, bindparam
+from models import db, SubtitleContent, TaskRequest, format_datetime
 from datetime import datetime, UTC, timedelta
 import os
-import json
+import sys
+import orjson
 import math
+import hashlib
 import uuid
+import queue
 import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from werkzeug.utils import secure_filename
-from utils import has_new_tasks, check_storage_limit
+from utils import new_task_event, check_storage_limit
+from routes.main import clear_task_list_cache
 
 api = Blueprint('api', __name__, url_prefix='/api')
 
+# 客户端会频繁轮询以下查询，在模块级别预先构建语句，
+# 每次请求只绑定参数，直接命中SQLAlchemy的编译缓存
+_count_tasks_by_status_stmt = select(func.count()).select_from(TaskRequest).where(
+    TaskRequest.status.in_(bindparam('statuses', expanding=True))
+)
+_pending_tasks_stmt = select(
+    TaskRequest.id, TaskRequest.youtube_url, TaskRequest.created_at, TaskRequest.result_task_id
+).where(
+    TaskRequest.status == 'pending'
+).order_by(TaskRequest.created_at)
+_task_by_url_stmt = select(TaskRequest).where(
+    TaskRequest.youtube_url == bindparam('youtube_url')
+).limit(1)
+
+# 认领任务：一条带条件的 UPDATE ... RETURNING 同时完成状态检查和更新
+_claim_task_stmt = update(TaskRequest).where(
+    TaskRequest.id == bindparam('task_id'),
+    TaskRequest.status == 'pending'
+).values(
+    status='processing',
+    client_id=bindparam('claim_client_id')
+).returning(TaskRequest)
+_start_download_task_stmt = update(SubtitleContent).where(
+    SubtitleContent.id == bindparam('download_task_id')
+).values(status='processing').execution_options(synchronize_session=False)
+
 @api.route('/tasks/new', methods=['GET'])
 def check_new_tasks():
-    """检查是否有新任务，供客户端调用"""
-    global has_new_tasks
-    
+    """检查是否有新任务，供客户端调用
+
+    没有待处理任务时会挂起请求（长轮询），直到有新任务提交或等待超时，
+    客户端可通过 timeout 参数缩短等待时间，传 0 则立即返回。
+    """
     client_id = request.args.get('client_id')
     if not client_id:
         return jsonify({'error': '缺少client_id参数'}), 400
     
-    # 检查是否有未处理完成的任务
-    active_tasks = TaskRequest.query.filter(
-        TaskRequest.status.in_(['pending', 'processing'])
-    ).count()
+    timeout = request.args.get('timeout', current_app.config['LONG_POLL_TIMEOUT'], type=float)
+    timeout = max(0, min(timeout, 60))  # 最长挂起60秒，避免被代理断开
+    
+    # 查询前先记下通知代数：查询之后提交的任务一定会改变代数，等待时不会被漏掉
+    generation = new_task_event.generation
+    
+    # 检查是否有可认领的任务（处理中的任务无法被认领，不算新任务）
+    pending_count = db.session.execute(
+        _count_tasks_by_status_stmt, {'statuses': ['pending']}
+    ).scalar()
     
-    # 如果有活跃的任务，确保标志为True
-    if active_tasks > 0:
-        has_new_tasks = True
+    has_new_tasks = pending_count > 0
+    if not has_new_tasks and timeout > 0:
+        # 挂起前归还数据库连接，等待期间不占用连接池
+        db.session.close()
+        has_new_tasks = new_task_event.wait(generation, timeout)
     
     return jsonify({
         'has_new_tasks': has_new_tasks
@@ -40,35 +83,34 @@ def check_new_tasks():
 @api.route('/tasks/pending', methods=['GET'])
 def get_pending_tasks():
     """获取待处理的任务列表，供客户端调用"""
-    global has_new_tasks
-    
     client_id = request.args.get('client_id')
     if not client_id:
         return jsonify({'error': '缺少client_id参数'}), 400
     
     # 获取所有待处理的任务请求
-    pending_tasks = TaskRequest.query.filter_by(status='pending').order_by(TaskRequest.created_at).all()
-    
-    # 如果没有待处理任务，则重置全局标志
-    if not pending_tasks:
-        has_new_tasks = False
+    # 只查询客户端需要的列，直接构建字典，不必创建完整的ORM对象
+    pending_tasks = db.session.execute(_pending_tasks_stmt).all()
     
     return jsonify({
-        'tasks': [task.to_dict() for task in pending_tasks]
+        'tasks': [{
+            'id': task_id,
+            'youtube_url': youtube_url,
+            'status': 'pending',
+            'created_at': format_datetime(created_at),
+            'result_task_id': result_task_id
+        } for task_id, youtube_url, created_at, result_task_id in pending_tasks]
     })
 
 @api.route('/tasks/add', methods=['POST'])
 def add_task():
     """通过API添加新的下载任务"""
-    global has_new_tasks
-    
     youtube_url = request.json.get('youtube_url')
     
     if not youtube_url:
         return jsonify({'error': '缺少必要参数'}), 400
     
     # 检查是否存在相同URL的任务请求
-    existing_task = TaskRequest.query.filter_by(youtube_url=youtube_url).first()
+    existing_task = db.session.execute(_task_by_url_stmt, {'youtube_url': youtube_url}).scalar()
     if existing_task:
         # 如果任务存在但已失败，可以考虑允许重新提交
         if existing_task.status == 'failed':
@@ -79,14 +121,15 @@ def add_task():
             # 重新创建一个下载任务记录
             new_task = SubtitleContent(youtube_url=youtube_url)
             db.session.add(new_task)
-            db.session.commit()
+            db.session.flush()  # 只为获取新任务ID，统一在最后提交
             
             # 关联新的下载任务ID
             existing_task.result_task_id = new_task.id
             db.session.commit()
             
-            # 设置全局有新任务标志
-            has_new_tasks = True
+            # 唤醒等待新任务的客户端
+            new_task_event.set()
+            clear_task_list_cache()
             
             return jsonify({
                 'status': 'success',
@@ -109,14 +152,15 @@ def add_task():
     # 创建一个对应的下载任务记录（处于等待状态）
     new_task = SubtitleContent(youtube_url=youtube_url)
     db.session.add(new_task)
-    db.session.commit()
+    db.session.flush()  # 只为获取新任务ID，统一在最后提交
     
     # 关联下载任务ID到任务请求
     new_task_request.result_task_id = new_task.id
     db.session.commit()
     
-    # 设置全局有新任务标志
-    has_new_tasks = True
+    # 唤醒等待新任务的客户端
+    new_task_event.set()
+    clear_task_list_cache()
     
     return jsonify({
         'status': 'success',
@@ -133,40 +177,47 @@ def claim_task():
     if not task_id or not client_id:
         return jsonify({'error': '缺少必要参数'}), 400
     
-    task = TaskRequest.query.get_or_404(task_id)
-    
-    # 确保任务仍然是待处理状态
-    if task.status != 'pending':
-        return jsonify({'error': '任务已被其他客户端认领或已完成'}), 409
+    # 条件更新：只有仍处于待处理状态的任务才会被更新，并发认领时只有一个客户端能成功
+    task = db.session.execute(
+        _claim_task_stmt, {'task_id': task_id, 'claim_client_id': client_id}
+    ).scalar()
     
-    # 更新任务状态
-    task.status = 'processing'
-    task.client_id = client_id
+    if task is None:
+        return jsonify({'error': '任务不存在、已被其他客户端认领或已完成'}), 409
     
     # 更新下载任务状态
     if task.result_task_id:
-        download_task = SubtitleContent.query.get(task.result_task_id)
-        if download_task:
-            download_task.status = 'processing'
+        db.session.execute(_start_download_task_stmt, {'download_task_id': task.result_task_id})
     
+    # 提交后对象会过期，先序列化以免再查询一次
+    task_data = task.to_dict()
     db.session.commit()
+    clear_task_list_cache()
     
     return jsonify({
         'status': 'success',
         'message': '任务认领成功',
-        'task': task.to_dict()
+        'task': task_data
     })
 
 @api.route('/tasks/complete', methods=['POST'])
 def complete_task():
-    """客户端完成任务上报"""
-    task_id = request.json.get('task_id')
-    client_id = request.json.get('client_id')
-    title = request.json.get('title', '')
-    description = request.json.get('description', '')
-    audio_filename = request.json.get('audio_filename')
-    subtitle_filename = request.json.get('subtitle_filename')
-    error_message = request.json.get('error_message')
+    """客户端完成任务上报
+    
+    支持JSON请求体，也支持multipart表单：音频(audio)和字幕(subtitle)文件可以随上报一起上传
+    """
+    if request.mimetype == 'multipart/form-data':
+        data = request.form
+        task_id = data.get('task_id', type=int)
+    else:
+        data = request.json
+        task_id = data.get('task_id')
+    client_id = data.get('client_id')
+    title = data.get('title', '')
+    description = data.get('description', '')
+    audio_filename = data.get('audio_filename')
+    subtitle_filename = data.get('subtitle_filename')
+    error_message = data.get('error_message')
     
     if not task_id or not client_id:
         return jsonify({'error': '缺少必要参数'}), 400
@@ -177,16 +228,29 @@ def complete_task():
     if task.client_id != client_id:
         return jsonify({'error': '无权限更新此任务'}), 403
     
+    # 随上报一起上传的文件
+    if request.files.get('audio'):
+        audio_filename = _store_upload(request.files['audio'])
+        if not audio_filename:
+            return jsonify({'error': '音频文件名无效'}), 400
+    if request.files.get('subtitle'):
+        subtitle_filename = _store_upload(request.files['subtitle'])
+        if not subtitle_filename:
+            return jsonify({'error': '字幕文件名无效'}), 400
+    
+    # 同一次上报使用同一个时间戳
+    now = datetime.now(UTC)
+    
     # 更新任务状态
     task.status = 'completed' if not error_message else 'failed'
-    task.processed_at = datetime.now(UTC)
+    task.processed_at = now
     
     # 更新下载任务记录
     if task.result_task_id:
         download_task = SubtitleContent.query.get(task.result_task_id)
         if download_task:
             download_task.status = 'completed' if not error_message else 'failed'
-            download_task.completed_at = datetime.now(UTC)
+            download_task.completed_at = now
             download_task.title = title
             download_task.description = description
             download_task.audio_filename = audio_filename
@@ -194,6 +258,7 @@ def complete_task():
             download_task.error_message = error_message
     
     db.session.commit()
+    clear_task_list_cache()
     
     return jsonify({
         'status': 'success',
@@ -211,8 +276,9 @@ def upload_file():
         return jsonify({'error': '未选择文件'}), 400
     
     # 保存文件
-    filename = file.filename
-    file.save(os.path.join(current_app.config['DOWNLOAD_FOLDER'], filename))
+    filename = _store_upload(file)
+    if not filename:
+        return jsonify({'error': '文件名无效'}), 400
     
     return jsonify({
         'status': 'success',
@@ -220,6 +286,143 @@ def upload_file():
         'filename': filename
     })
 
+# 上传会话中不变的信息（文件名、分块总数等）在进程内缓存，session.json 只在初始化时写入一次，
+# 已接收的分块数通过统计分块文件得到，不再每个分块都重写会话文件
+_upload_sessions = {}
+_upload_sessions_lock = threading.Lock()
+
+def _load_upload_session(upload_id, upload_dir):
+    """读取上传会话信息，优先使用进程内缓存；会话不存在时返回None"""
+    with _upload_sessions_lock:
+        session_info = _upload_sessions.get(upload_id)
+    
+    if session_info is None:
+        try:
+            with open(os.path.join(upload_dir, 'session.json'), 'rb') as f:
+                session_info = orjson.loads(f.read())
+        except FileNotFoundError:
+            return None
+        
+        with _upload_sessions_lock:
+            _upload_sessions[upload_id] = session_info
+    
+    return session_info
+
+def _forget_upload_session(upload_id):
+    """从进程内缓存中移除上传会话"""
+    with _upload_sessions_lock:
+        _upload_sessions.pop(upload_id, None)
+
+def _count_received_chunks(upload_dir):
+    """统计已完整写入的分块数量（不含正在写入的 .part 文件）"""
+    with os.scandir(upload_dir) as entries:
+        return sum(1 for entry in entries
+                   if entry.name.startswith('chunk_') and not entry.name.endswith('.part'))
+
+def _claim_merge(upload_dir):
+    """尝试获得分块合并权，同一上传只有第一个调用者返回True"""
+    try:
+        os.close(os.open(os.path.join(upload_dir, '.merging'), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        return False
+
+def _file_sha256(path):
+    """计算文件的SHA-256摘要（十六进制）"""
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+def _same_file_exists(filename, file_size, sha256):
+    """下载目录中是否已有大小和摘要都相同的同名文件"""
+    path = os.path.join(current_app.config['DOWNLOAD_FOLDER'], filename)
+    try:
+        if os.stat(path).st_size != file_size:
+            return False
+    except FileNotFoundError:
+        return False
+    return _file_sha256(path) == sha256
+
+# 合并分块时尽量在内核中完成拷贝：优先 copy_file_range（支持的文件系统上可直接共享数据块），
+# 其次 Linux 上的 sendfile，都不可用时退回到缓冲区拷贝
+if hasattr(os, 'copy_file_range'):
+    def _kernel_copy(in_fd, out_fd, offset, count):
+        return os.copy_file_range(in_fd, out_fd, count, offset)
+elif sys.platform.startswith('linux'):
+    def _kernel_copy(in_fd, out_fd, offset, count):
+        return os.sendfile(out_fd, in_fd, offset, count)
+else:
+    _kernel_copy = None
+
+_COPY_BUFFER_SIZE = 1024 * 1024  # 1MB
+
+# 拷贝缓冲区池，合并和保存分块时复用缓冲区，避免每次都分配大块内存
+_copy_buffer_pool = queue.LifoQueue(maxsize=4)
+
+def _copy_stream(src, dst):
+    """使用缓冲池中的缓冲区把 src 的剩余内容拷贝到 dst"""
+    try:
+        buf = _copy_buffer_pool.get_nowait()
+    except queue.Empty:
+        buf = bytearray(_COPY_BUFFER_SIZE)
+    
+    try:
+        with memoryview(buf) as view:
+            while True:
+                n = src.readinto(buf)
+                if not n:
+                    break
+                data = view[:n]
+                # dst 可能是无缓冲文件，write 不保证一次写完
+                while data:
+                    data = data[dst.write(data):]
+    finally:
+        try:
+            _copy_buffer_pool.put_nowait(buf)
+        except queue.Full:
+            pass
+
+def _append_file(outfile, src_path):
+    """把 src_path 的内容追加到 outfile（须以无缓冲方式打开）末尾"""
+    with open(src_path, 'rb') as infile:
+        if _kernel_copy is not None:
+            offset = 0
+            try:
+                size = os.fstat(infile.fileno()).st_size
+                while offset < size:
+                    copied = _kernel_copy(infile.fileno(), outfile.fileno(), offset, size - offset)
+                    if copied == 0:
+                        break
+                    offset += copied
+                return
+            except OSError:
+                # 部分内核或文件系统不支持，从已拷贝的位置继续用普通方式拷贝
+                infile.seek(offset)
+        _copy_stream(infile, outfile)
+
+def _save_upload(file_storage, dst):
+    """保存上传的文件；内容已落盘到同一文件系统的临时文件时直接硬链接，否则用缓冲池拷贝"""
+    stream = file_storage.stream
+    tmp_name = getattr(stream, 'name', None)
+    if isinstance(tmp_name, str):
+        stream.flush()
+        try:
+            os.link(tmp_name, dst)
+            return
+        except OSError:
+            pass
+    
+    with open(dst, 'wb') as f:
+        _copy_stream(stream, f)
+
+def _store_upload(file_storage):
+    """把上传的文件保存到下载目录，返回保存的文件名；文件名不合法时返回None"""
+    # 文件名由客户端提供，去掉路径部分，避免写到下载目录之外
+    filename = secure_filename(file_storage.filename or '')
+    if not filename:
+        return None
+    _save_upload(file_storage, os.path.join(current_app.config['DOWNLOAD_FOLDER'], filename))
+    return filename
+
 # 文件分块上传相关API
 @api.route('/file/init_upload', methods=['POST'])
 def init_upload():
@@ -227,17 +430,27 @@ def init_upload():
     filename = request.json.get('filename')
     file_size = request.json.get('file_size')
     file_type = request.json.get('file_type')
+    sha256 = request.json.get('sha256')
     
     if not filename or not file_size:
         return jsonify({'error': '缺少必要参数'}), 400
     
+    # 安全处理文件名
+    safe_filename = secure_filename(filename)
+    
+    # 客户端提供了文件摘要且服务器上已有相同内容的文件时，无需再上传
+    if sha256 and _same_file_exists(safe_filename, int(file_size), sha256):
+        return jsonify({
+            'status': 'success',
+            'message': '文件已存在，无需上传',
+            'filename': safe_filename,
+            'complete': True
+        })
+    
     # 检查存储空间是否足够
     if check_storage_limit(current_app, int(file_size)):
         return jsonify({'error': '服务器存储空间不足'}), 507
     
-    # 安全处理文件名
-    safe_filename = secure_filename(filename)
-    
     # 创建一个唯一的上传ID
     upload_id = str(uuid.uuid4())
     
@@ -251,13 +464,17 @@ def init_upload():
         'file_size': file_size,
         'file_type': file_type,
         'upload_id': upload_id,
-        'chunks_received': 0,
         'total_chunks': math.ceil(int(file_size) / current_app.config['CHUNK_SIZE']),
-        'created_at': datetime.now(UTC).isoformat()
+        'sha256': sha256,
+        'created_at': datetime.now(UTC)
     }
     
-    with open(os.path.join(upload_dir, 'session.json'), 'w') as f:
-        json.dump(session_info, f)
+    # orjson 直接把带时区的 datetime 序列化为 ISO 8601 字符串
+    with open(os.path.join(upload_dir, 'session.json'), 'wb') as f:
+        f.write(orjson.dumps(session_info))
+    
+    with _upload_sessions_lock:
+        _upload_sessions[upload_id] = session_info
     
     return jsonify({
         'status': 'success',
@@ -282,40 +499,49 @@ def upload_chunk():
     
     # 检查上传会话是否存在
     upload_dir = os.path.join(current_app.config['TEMP_UPLOAD_FOLDER'], upload_id)
-    session_file = os.path.join(upload_dir, 'session.json')
+    session_info = _load_upload_session(upload_id, upload_dir)
     
-    if not os.path.exists(session_file):
+    if session_info is None:
         return jsonify({'error': '上传会话不存在或已过期'}), 404
     
-    # 读取会话信息
-    with open(session_file, 'r') as f:
-        session_info = json.load(f)
-    
-    # 保存分块
+    # 保存分块：先写入 .part 临时文件再重命名，统计分块时不会算入写了一半的分块
     chunk = request.files['file']
     chunk_file = os.path.join(upload_dir, f'chunk_{chunk_index}')
-    chunk.save(chunk_file)
-    
-    # 更新会话信息
-    session_info['chunks_received'] += 1
+    try:
+        _save_upload(chunk, chunk_file + '.part')
+    except FileNotFoundError:
+        # 上传目录已被清理
+        _forget_upload_session(upload_id)
+        return jsonify({'error': '上传会话不存在或已过期'}), 404
+    os.replace(chunk_file + '.part', chunk_file)
     
-    with open(session_file, 'w') as f:
-        json.dump(session_info, f)
+    chunks_received = _count_received_chunks(upload_dir)
     
-    # 检查是否所有分块都已接收
-    if session_info['chunks_received'] >= session_info['total_chunks']:
+    # 检查是否所有分块都已接收；客户端并发上传时最后几个分块可能同时到达，
+    # 用O_EXCL创建标记文件，保证只有一个请求执行合并
+    if chunks_received >= session_info['total_chunks'] and _claim_merge(upload_dir):
         # 合并所有分块
         try:
             final_path = os.path.join(current_app.config['DOWNLOAD_FOLDER'], session_info['filename'])
-            with open(final_path, 'wb') as outfile:
+            with open(final_path, 'wb', buffering=0) as outfile:
                 for i in range(session_info['total_chunks']):
                     chunk_file = os.path.join(upload_dir, f'chunk_{i}')
                     if os.path.exists(chunk_file):
-                        with open(chunk_file, 'rb') as infile:
-                            outfile.write(infile.read())
+                        _append_file(outfile, chunk_file)
+            
+            # 客户端提供了文件摘要时校验合并结果
+            if session_info.get('sha256') and _file_sha256(final_path) != session_info['sha256']:
+                os.unlink(final_path)
+                shutil.rmtree(upload_dir)
+                _forget_upload_session(upload_id)
+                return jsonify({
+                    'status': 'error',
+                    'message': '文件校验失败，请重新上传'
+                }), 422
             
             # 清理临时文件
             shutil.rmtree(upload_dir)
+            _forget_upload_session(upload_id)
             
             return jsonify({
                 'status': 'success',
@@ -324,6 +550,11 @@ def upload_chunk():
                 'complete': True
             })
         except Exception as e:
+            # 释放合并标记，允许重新上传分块后再次合并
+            try:
+                os.unlink(os.path.join(upload_dir, '.merging'))
+            except OSError:
+                pass
             return jsonify({
                 'status': 'error',
                 'message': f'合并文件时出错: {str(e)}'
@@ -332,87 +563,148 @@ def upload_chunk():
     return jsonify({
         'status': 'success',
         'message': f'分块 {chunk_index} 上传成功',
-        'chunks_received': session_info['chunks_received'],
+        'chunks_received': chunks_received,
         'total_chunks': session_info['total_chunks'],
         'complete': False
     })
 
-@api.route('/file/cleanup_uploads', methods=['POST'])
-def cleanup_uploads():
-    """清理过期的上传会话"""
+# 存储清理涉及大量磁盘删除操作，放到后台线程执行，请求立即返回任务ID
+_storage_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='storage')
+_storage_jobs = {}  # job_id -> (提交时间, Future)
+_storage_jobs_lock = threading.Lock()
+
+def _submit_storage_job(fn, *args):
+    """提交后台存储清理任务，返回 202 响应"""
+    now = datetime.now(UTC)
+    job_id = str(uuid.uuid4())
+    
+    with _storage_jobs_lock:
+        # 丢弃一小时前已完成的任务记录
+        for old_id, (submitted_at, future) in list(_storage_jobs.items()):
+            if future.done() and now - submitted_at > timedelta(hours=1):
+                del _storage_jobs[old_id]
+        _storage_jobs[job_id] = (now, _storage_executor.submit(fn, *args))
+    
+    return jsonify({
+        'status': 'accepted',
+        'message': '清理任务已提交，正在后台执行',
+        'job_id': job_id
+    }), 202
+
+def _cleanup_expired_uploads(temp_upload_folder):
+    """清理过期的上传会话（后台执行），返回结果说明"""
     # 设置过期时间（24小时）
     expiration_time = datetime.now(UTC) - timedelta(hours=24)
     
     cleaned_count = 0
     
-    # 查找所有上传会话目录
-    for upload_id in os.listdir(current_app.config['TEMP_UPLOAD_FOLDER']):
-        upload_dir = os.path.join(current_app.config['TEMP_UPLOAD_FOLDER'], upload_id)
-        session_file = os.path.join(upload_dir, 'session.json')
-        
-        if os.path.exists(session_file):
+    # 查找所有上传会话目录，scandir 一次返回目录项及其类型
+    with os.scandir(temp_upload_folder) as entries:
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            
+            upload_dir = entry.path
+            
+            # 直接打开会话文件，不先判断是否存在；文件缺失、正在写入或内容无法解析时跳过，
+            # 避免误删刚创建的会话
             try:
-                with open(session_file, 'r') as f:
-                    session_info = json.load(f)
-                
+                with open(os.path.join(upload_dir, 'session.json'), 'rb') as f:
+                    session_info = orjson.loads(f.read())
                 created_at = datetime.fromisoformat(session_info['created_at'])
-                
-                # 如果会话已过期，则清理
-                if created_at < expiration_time:
-                    shutil.rmtree(upload_dir)
-                    cleaned_count += 1
-            except:
-                # 如果无法读取会话文件，也清理
-                shutil.rmtree(upload_dir)
+                expired = created_at < expiration_time
+            except (FileNotFoundError, ValueError, KeyError, TypeError):
+                continue
+            
+            # 只清理确实已过期的会话
+            if expired:
+                shutil.rmtree(upload_dir, ignore_errors=True)
+                _forget_upload_session(entry.name)
                 cleaned_count += 1
     
-    return jsonify({
-        'status': 'success',
-        'message': f'已清理 {cleaned_count} 个过期上传会话'
-    })
+    return f'已清理 {cleaned_count} 个过期上传会话'
 
-@api.route('/file/manage_storage', methods=['POST'])
-def manage_storage():
-    """管理存储空间，删除过期文件"""
+def _expire_old_files(app):
+    """删除过期文件并更新任务状态（后台执行），返回结果说明"""
     # 设置文件过期时间（30天）
     expiration_time = datetime.now(UTC) - timedelta(days=30)
     
     deleted_count = 0
     freed_space = 0
     
-    # 查找已完成且过期的任务
-    expired_tasks = SubtitleContent.query.filter(
-        SubtitleContent.status == 'completed',
-        SubtitleContent.completed_at < expiration_time
-    ).all()
-    
-    for task in expired_tasks:
-        # 删除关联的音频文件
-        if task.audio_filename:
-            file_path = os.path.join(current_app.config['DOWNLOAD_FOLDER'], task.audio_filename)
-            if os.path.exists(file_path):
-                file_size = os.path.getsize(file_path)
-                os.remove(file_path)
-                freed_space += file_size
-                deleted_count += 1
+    with app.app_context():
+        expired_filter = (
+            SubtitleContent.status == 'completed',
+            SubtitleContent.completed_at < expiration_time
+        )
+        
+        # 只取出过期任务的文件名，然后用一条 UPDATE 语句批量标记为过期
+        expired_files = db.session.execute(
+            select(SubtitleContent.audio_filename, SubtitleContent.subtitle_filename).where(*expired_filter)
+        ).all()
         
-        # 删除关联的字幕文件
-        if task.subtitle_filename:
-            file_path = os.path.join(current_app.config['DOWNLOAD_FOLDER'], task.subtitle_filename)
-            if os.path.exists(file_path):
-                file_size = os.path.getsize(file_path)
-                os.remove(file_path)
-                freed_space += file_size
-                deleted_count += 1
+        db.session.execute(
+            update(SubtitleContent)
+            .where(*expired_filter)
+            .values(status='expired', audio_filename=None, subtitle_filename=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        clear_task_list_cache()
         
-        # 更新任务状态
-        task.audio_filename = None
-        task.subtitle_filename = None
-        task.status = 'expired'
+        download_folder = app.config['DOWNLOAD_FOLDER']
     
-    db.session.commit()
+    # 删除关联的音频和字幕文件
+    for filenames in expired_files:
+        for filename in filenames:
+            if not filename:
+                continue
+            
+            file_path = os.path.join(download_folder, filename)
+            try:
+                file_size = os.stat(file_path).st_size
+                os.unlink(file_path)
+            except FileNotFoundError:
+                continue
+            
+            freed_space += file_size
+            deleted_count += 1
+    
+    return f'已删除 {deleted_count} 个过期文件，释放 {freed_space / (1024*1024):.2f} MB 空间'
+
+@api.route('/file/cleanup_uploads', methods=['POST'])
+def cleanup_uploads():
+    """清理过期的上传会话（后台执行）"""
+    return _submit_storage_job(_cleanup_expired_uploads, current_app.config['TEMP_UPLOAD_FOLDER'])
+
+@api.route('/file/manage_storage', methods=['POST'])
+def manage_storage():
+    """管理存储空间，删除过期文件（后台执行）"""
+    return _submit_storage_job(_expire_old_files, current_app._get_current_object())
+
+@api.route('/file/jobs/<job_id>', methods=['GET'])
+def get_storage_job(job_id):
+    """查询后台存储清理任务的执行结果"""
+    with _storage_jobs_lock:
+        job = _storage_jobs.get(job_id)
+    
+    if job is None:
+        return jsonify({'error': '任务不存在或已过期'}), 404
+    
+    future = job[1]
+    if not future.done():
+        return jsonify({'status': 'running', 'job_id': job_id})
+    
+    error = future.exception()
+    if error is not None:
+        return jsonify({
+            'status': 'error',
+            'job_id': job_id,
+            'message': f'清理任务执行出错: {str(error)}'
+        })
     
     return jsonify({
         'status': 'success',
-        'message': f'已删除 {deleted_count} 个过期文件，释放 {freed_space / (1024*1024):.2f} MB 空间'
-    })
\ No newline at end of file
+        'job_id': job_id,
+        'message': future.result()
+    })
@@ -3,35 +3,99 @@ Main routes for YouTube Downloader Flask Application
 """
 
 from flask import Blueprint, render_template, request, jsonify, send_from_directory, url_for, abort, current_app
+from sqlalchemy import select, bindparam, tuple_
+from sqlalchemy.orm import defer, load_only
 from models import db, SubtitleContent, TaskRequest
 from datetime import datetime, UTC
 import threading
 import os
-from utils import process_video_task
-
-# 在模块级别定义全局变量
-tasks_available = False
+from types import SimpleNamespace
+from utils import process_video_task, new_task_event, cache
 
 main = Blueprint('main', __name__)
 
+# 预先构建按URL查重的语句，每次提交只绑定参数
+_task_by_url_stmt = select(TaskRequest).where(
+    TaskRequest.youtube_url == bindparam('youtube_url')
+).limit(1)
+
+@cache.memoize()
+def _recent_tasks():
+    """最近的10个任务（短时间缓存）"""
+    # 首页不展示描述，不读取这个较大的TEXT列
+    return SubtitleContent.query.options(
+        defer(SubtitleContent.description)
+    ).order_by(SubtitleContent.created_at.desc()).limit(10).all()
+
+@cache.memoize()
+def _subtitle_page(per_page, after=None, before=None):
+    """已完成字幕列表的一页（短时间缓存），after/before为(completed_at, id)游标"""
+    # 查询已完成的任务（有字幕文件的），只读取列表页用到的列
+    query = SubtitleContent.query.options(
+        load_only(SubtitleContent.id, SubtitleContent.title, SubtitleContent.subtitle_filename,
+                  SubtitleContent.audio_filename, SubtitleContent.completed_at)
+    ).filter(
+        SubtitleContent.status == 'completed',
+        SubtitleContent.subtitle_filename.isnot(None),
+        SubtitleContent.completed_at.isnot(None)
+    )
+    # 按游标定位，不再额外执行COUNT，多取一条用来判断是否还有下一页
+    cursor = tuple_(SubtitleContent.completed_at, SubtitleContent.id)
+    if before:
+        # 上一页：取比游标更新的记录，按正序查询后再翻转
+        rows = query.filter(cursor > tuple_(*before)).order_by(
+            SubtitleContent.completed_at.asc(), SubtitleContent.id.asc()
+        ).limit(per_page + 1).all()
+        items = rows[:per_page][::-1]
+        has_prev, has_next = len(rows) > per_page, True
+    else:
+        if after:
+            query = query.filter(cursor < tuple_(*after))
+        rows = query.order_by(
+            SubtitleContent.completed_at.desc(), SubtitleContent.id.desc()
+        ).limit(per_page + 1).all()
+        items = rows[:per_page]
+        has_prev, has_next = after is not None, len(rows) > per_page
+    
+    return SimpleNamespace(
+        items=items,
+        has_prev=has_prev and bool(items),
+        has_next=has_next and bool(items),
+        first=(items[0].completed_at, items[0].id) if items else None,
+        last=(items[-1].completed_at, items[-1].id) if items else None
+    )
+
+def _page_cursor(prefix):
+    """从查询参数中解析翻页游标，参数不完整时返回None"""
+    completed_at = request.args.get(f'{prefix}_completed_at')
+    task_id = request.args.get(f'{prefix}_id', type=int)
+    if not completed_at or task_id is None:
+        return None
+    try:
+        return datetime.fromisoformat(completed_at), task_id
+    except ValueError:
+        abort(400)
+
+def clear_task_list_cache():
+    """任务新增或状态变化后，清除首页和字幕列表的缓存"""
+    cache.delete_memoized(_recent_tasks)
+    cache.delete_memoized(_subtitle_page)
+
 @main.route('/')
 def index():
     """主页，显示下载表单和任务列表"""
-    # 获取最近的10个任务
-    recent_tasks = SubtitleContent.query.order_by(SubtitleContent.created_at.desc()).limit(10).all()
-    return render_template('index.html', recent_tasks=recent_tasks)
+    return render_template('index.html', recent_tasks=_recent_tasks())
 
 @main.route('/submit', methods=['POST'])
 def submit_task():
     """提交新的下载任务请求"""
-    global tasks_available
     youtube_url = request.form.get('youtube_url')
     
     if not youtube_url:
         return jsonify({'status': 'error', 'message': '请提供YouTube URL'}), 400
     
     # 检查是否存在相同URL的任务请求
-    existing_task = TaskRequest.query.filter_by(youtube_url=youtube_url).first()
+    existing_task = db.session.execute(_task_by_url_stmt, {'youtube_url': youtube_url}).scalar()
     if existing_task:
         # 如果任务存在但已失败，可以考虑允许重新提交
         if existing_task.status == 'failed':
@@ -42,14 +106,15 @@ def submit_task():
             # 重新创建一个下载任务记录
             new_task = SubtitleContent(youtube_url=youtube_url)
             db.session.add(new_task)
-            db.session.commit()
+            db.session.flush()  # 只为获取新任务ID，统一在最后提交
             
             # 关联新的下载任务ID
             existing_task.result_task_id = new_task.id
             db.session.commit()
             
-            # 设置全局有新任务标志
-            tasks_available = True
+            # 唤醒等待新任务的客户端
+            new_task_event.set()
+            clear_task_list_cache()
             
             return jsonify({
                 'status': 'success',
@@ -72,14 +137,15 @@ def submit_task():
     # 创建一个对应的下载任务记录（处于等待状态）
     new_task = SubtitleContent(youtube_url=youtube_url)
     db.session.add(new_task)
-    db.session.commit()
+    db.session.flush()  # 只为获取新任务ID，统一在最后提交
     
     # 关联下载任务ID到任务请求
     new_task_request.result_task_id = new_task.id
     db.session.commit()
     
-    # 设置全局有新任务标志
-    tasks_available = True
+    # 唤醒等待新任务的客户端
+    new_task_event.set()
+    clear_task_list_cache()
     
     return jsonify({
         'status': 'success', 
@@ -100,14 +166,18 @@ def download_file(filename):
 
 @main.route('/subtitles')
 def subtitle_list():
-    """分页显示字幕列表"""
-    page = request.args.get('page', 1, type=int)
+    """分页显示字幕列表（按完成时间游标翻页）"""
     per_page = current_app.config['SUBTITLES_PER_PAGE']
+    before = _page_cursor('before')
+    after = None if before else _page_cursor('after')
+    tasks = _subtitle_page(per_page, after, before)
     
-    # 查询已完成的任务（有字幕文件的）
-    tasks = SubtitleContent.query.filter(
-        SubtitleContent.status == 'completed',
-        SubtitleContent.subtitle_filename.isnot(None)
-    ).order_by(SubtitleContent.completed_at.desc()).paginate(page=page, per_page=per_page)
+    prev_url = next_url = None
+    if tasks.has_prev:
+        prev_url = url_for('main.subtitle_list', before_completed_at=tasks.first[0].isoformat(),
+                           before_id=tasks.first[1])
+    if tasks.has_next:
+        next_url = url_for('main.subtitle_list', after_completed_at=tasks.last[0].isoformat(),
+                           after_id=tasks.last[1])
     
-    return render_template('subtitles/list.html', tasks=tasks)
\ No newline at end of file
+    return render_template('subtitles/list.html', tasks=tasks, prev_url=prev_url, next_url=next_url)
\ No newline at end of file
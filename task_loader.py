@@ -2,7 +2,7 @@
 YouTube 下载任务客户端处理程序
 
 这个程序在客户端运行，负责:
-1. 定期检查服务器是否有新的下载任务
+1. 通过长轮询等待服务器上的新下载任务
 2. 认领并处理任务（下载音频和生成字幕）
 3. 将结果上传回服务器
 
@@ -12,28 +12,180 @@ YouTube 下载任务客户端处理程序
 import os
 import sys
 import time
-import json
+import orjson
+import hashlib
 import uuid
 import socket
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import argparse
 from datetime import datetime
-import youtube_content_extractor
 import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 import shutil
 import tempfile
+import io
+import traceback
+import queue
+import signal
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('task_loader.log')
-    ]
-)
 logger = logging.getLogger('task_loader')
 
+# 日志文件单个最大50MB，最多保留3个历史文件
+LOG_MAX_BYTES = 50 * 1024 * 1024
+LOG_BACKUP_COUNT = 3
+
+# 分块上传进度日志的最小间隔（秒）
+PROGRESS_LOG_INTERVAL = 5
+
+# 大于此大小（10MB）的文件使用分块上传
+CHUNKED_UPLOAD_THRESHOLD = 10 * 1024 * 1024
+
+# 分块上传时并发发送的分块数
+CHUNK_UPLOAD_WORKERS = 4
+
+# 长轮询检查新任务时服务器保持连接的最长时间（秒），服务端上限为60秒
+LONG_POLL_TIMEOUT = 60
+
+def _setup_logging():
+    """
+    配置日志：记录先放入队列，由后台线程写入控制台和滚动日志文件，
+    上传和轮询线程不会因写日志而阻塞在磁盘I/O上
+    
+    返回需要在退出前停止的QueueListener
+    """
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+    file_handler = RotatingFileHandler('task_loader.log', maxBytes=LOG_MAX_BYTES,
+                                       backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+    file_handler.setFormatter(formatter)
+    
+    log_queue = queue.SimpleQueue()
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    root_logger.addHandler(QueueHandler(log_queue))
+    
+    listener = QueueListener(log_queue, stream_handler, file_handler)
+    listener.start()
+    return listener
+
+class _MultipartBody:
+    """按需读取的multipart/form-data请求体
+    
+    requests 的 files= 参数会先把整个文件读入内存拼成请求体；这里只预先生成表单头部，
+    发送时按块读取文件内容，内存占用与文件大小无关。
+    """
+    
+    def __init__(self, fields, files):
+        boundary = uuid.uuid4().hex
+        self.content_type = f'multipart/form-data; boundary={boundary}'
+        
+        # 请求体由若干段组成：bytes 为表单头部或字段内容，str 为需要读取的文件路径
+        self._parts = []
+        for name, value in fields.items():
+            if value is None:
+                continue
+            self._parts.append(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode('utf-8')
+            )
+        for name, file_path in files.items():
+            filename = os.path.basename(file_path).replace('"', '%22')
+            self._parts.append(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                f'Content-Type: application/octet-stream\r\n\r\n'.encode('utf-8')
+            )
+            self._parts.append(file_path)
+            self._parts.append(b'\r\n')
+        self._parts.append(f'--{boundary}--\r\n'.encode('utf-8'))
+        
+        self._length = sum(len(part) if isinstance(part, bytes) else os.path.getsize(part)
+                           for part in self._parts)
+        self.seek(0)
+    
+    def __len__(self):
+        return self._length
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def tell(self):
+        return self._position
+    
+    def seek(self, offset, whence=0):
+        # 只支持回到开头（连接失败重试时重新发送）
+        if offset != 0 or whence != 0:
+            raise io.UnsupportedOperation('只能回到请求体开头')
+        self.close()
+        self._index = 0
+        self._offset = 0
+        self._position = 0
+        return 0
+    
+    def read(self, size=-1):
+        chunks = []
+        while self._index < len(self._parts) and size != 0:
+            part = self._parts[self._index]
+            if isinstance(part, bytes):
+                end = len(part) if size < 0 else min(len(part), self._offset + size)
+                data = part[self._offset:end]
+                self._offset = end
+                if end == len(part):
+                    self._index += 1
+                    self._offset = 0
+            else:
+                if self._file is None:
+                    self._file = open(part, 'rb')
+                data = self._file.read(size)
+                if not data or size < 0:
+                    self._file.close()
+                    self._file = None
+                    self._index += 1
+                    if not data:
+                        continue
+            chunks.append(data)
+            self._position += len(data)
+            if size > 0:
+                size -= len(data)
+        return b''.join(chunks)
+    
+    def close(self):
+        if getattr(self, '_file', None) is not None:
+            self._file.close()
+        self._file = None
+
+def _parse_json(response):
+    """用orjson直接解析响应的原始字节，非200响应返回None"""
+    if response.status_code != 200:
+        return None
+    return orjson.loads(response.content)
+
+def _find_audio_file(directory):
+    """返回目录中第一个MP3文件的路径，没有时返回None"""
+    with os.scandir(directory) as entries:
+        return next((entry.path for entry in entries if entry.name.endswith('.mp3')), None)
+
+def _warm_up_worker():
+    """在工作进程启动后预先导入youtube_content_extractor（及whisper等依赖），返回工作进程的PID"""
+    import youtube_content_extractor
+    return os.getpid()
+
+def _extract_worker(youtube_url, download_dir):
+    """在工作进程中下载并转录视频（模块级函数，供进程池调用）"""
+    # 只在工作进程中导入，主进程不加载whisper/CUDA
+    import youtube_content_extractor
+    
+    # 修改DOWNLOAD_DIR，让youtube_content_extractor使用临时目录（只影响工作进程）
+    youtube_content_extractor.DOWNLOAD_DIR = download_dir
+    return youtube_content_extractor.process_youtube_video(youtube_url)
+
 class YouTubeTaskLoader:
     def __init__(self, server_url, check_interval=10, download_dir=None):
         """
@@ -41,7 +193,7 @@ class YouTubeTaskLoader:
         
         参数:
             server_url: API服务器地址，例如 http://localhost:5000
-            check_interval: 检查新任务的间隔时间（秒）
+            check_interval: 检查新任务失败后重试的间隔时间（秒）
             download_dir: 下载文件的保存目录（仅用于暂存，将在任务完成后清理）
         """
         self.server_url = server_url.rstrip('/')
@@ -51,6 +203,17 @@ class YouTubeTaskLoader:
         hostname = socket.gethostname()
         self.client_id = f"{hostname}-{uuid.uuid4()}"
         
+        # 所有请求共用一个会话，复用keep-alive连接，避免每次请求都重新建立TCP/TLS连接
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=16,
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({"X-Client-Id": self.client_id})
+        
         # 设置临时下载目录 - 默认在程序同级目录下的temp文件夹
         if download_dir:
             self.temp_dir = os.path.join(download_dir, 'temp')
@@ -58,6 +221,9 @@ class YouTubeTaskLoader:
             # 使用程序同级目录作为默认临时目录，而不是系统临时目录
             self.temp_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'temp')
         
+        # 下载和转录在单独的工作进程中执行（spawn方式，不继承主进程的线程和连接）
+        self._worker = self._create_worker()
+        
         # 确保临时目录存在
         if not os.path.exists(self.temp_dir):
             os.makedirs(self.temp_dir, exist_ok=True)
@@ -66,6 +232,29 @@ class YouTubeTaskLoader:
         logger.info(f"服务器地址: {self.server_url}")
         logger.info(f"临时目录: {self.temp_dir}")
     
+    def _create_worker(self):
+        """创建执行下载和转录的单进程进程池
+        
+        工作进程在任务之间常驻，导入的模块和加载的状态可以跨任务复用；
+        创建后立即提交预热任务，等待新任务期间就完成依赖导入，预热任务的结果是工作进程的PID
+        """
+        worker = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+        self._worker_pid = worker.submit(_warm_up_worker)
+        return worker
+    
+    def _restart_worker(self):
+        """结束当前工作进程（例如处理超时仍在运行）并重新创建进程池"""
+        # 只有一个工作进程，任务在预热之后执行，能运行到超时的任务一定已经拿到了PID；
+        # 预热失败时进程池已损坏，工作进程也已退出，不需要结束
+        if self._worker_pid.done() and not self._worker_pid.exception():
+            try:
+                os.kill(self._worker_pid.result(), signal.SIGTERM)
+            except OSError:
+                # 进程已经退出
+                pass
+        self._worker.shutdown(wait=False, cancel_futures=True)
+        self._worker = self._create_worker()
+    
     def cleanup(self):
         """清理临时文件夹"""
         try:
@@ -76,49 +265,56 @@ class YouTubeTaskLoader:
         except Exception as e:
             logger.error(f"清理临时目录时出错: {str(e)}")
     
-    def check_new_tasks(self):
-        """检查服务器是否有新的任务"""
+    def check_new_tasks(self, wait=0):
+        """检查服务器是否有新的任务
+        
+        参数:
+            wait: 长轮询等待时间（秒），服务器在有新任务或超时前保持连接
+        
+        返回True/False，请求失败时返回None
+        """
         try:
-            response = requests.get(
-                f"{self.server_url}/api/tasks/new",
-                params={"client_id": self.client_id}
+            response, data = self._get_json(
+                "/api/tasks/new",
+                params={"client_id": self.client_id, "timeout": wait},
+                timeout=wait + 10
             )
             if response.status_code == 200:
-                data = response.json()
                 return data.get('has_new_tasks', False)
             else:
                 logger.error(f"检查新任务失败: {response.status_code} - {response.text}")
-                return False
+                return None
         except Exception as e:
             logger.error(f"检查新任务出错: {str(e)}")
-            return False
+            return None
     
     def get_pending_tasks(self):
-        """获取待处理的任务列表"""
+        """获取待处理的任务列表
+        
+        返回任务列表（没有任务时为空列表），请求失败时返回None
+        """
         try:
-            response = requests.get(
-                f"{self.server_url}/api/tasks/pending",
+            response, data = self._get_json(
+                "/api/tasks/pending",
                 params={"client_id": self.client_id}
             )
             if response.status_code == 200:
-                data = response.json()
                 return data.get('tasks', [])
             else:
                 logger.error(f"获取待处理任务失败: {response.status_code} - {response.text}")
-                return []
+                return None
         except Exception as e:
             logger.error(f"获取待处理任务出错: {str(e)}")
-            return []
+            return None
     
     def claim_task(self, task_id):
         """认领任务"""
         try:
-            response = requests.post(
-                f"{self.server_url}/api/tasks/claim",
-                json={"task_id": task_id, "client_id": self.client_id}
+            response, data = self._post_json(
+                "/api/tasks/claim",
+                {"task_id": task_id, "client_id": self.client_id}
             )
             if response.status_code == 200:
-                data = response.json()
                 logger.info(f"任务认领成功: {task_id}")
                 return True, data.get('task', {})
             else:
@@ -128,130 +324,190 @@ class YouTubeTaskLoader:
             logger.error(f"任务认领出错: {str(e)}")
             return False, {}
     
-    def upload_file_in_chunks(self, file_path):
-        """以分块方式上传大文件"""
+    def _get_json(self, path, params=None, **kwargs):
+        """发送GET请求，返回(响应, 解析后的JSON)；非200响应不解析JSON"""
+        response = self.session.get(f"{self.server_url}{path}", params=params, **kwargs)
+        return response, _parse_json(response)
+    
+    def _post_json(self, path, payload, **kwargs):
+        """用orjson序列化请求体发送POST请求，返回(响应, 解析后的JSON)"""
+        response = self.session.post(
+            f"{self.server_url}{path}",
+            data=orjson.dumps(payload),
+            headers={"Content-Type": "application/json"},
+            **kwargs
+        )
+        return response, _parse_json(response)
+    
+    def _post_multipart(self, path, fields, files):
+        """以流式multipart表单发送POST请求，files为 {字段名: 文件路径}，返回服务器响应"""
+        with _MultipartBody(fields, files) as body:
+            return self.session.post(
+                f"{self.server_url}{path}",
+                data=body,
+                headers={"Content-Type": body.content_type}
+            )
+    
+    def _upload_chunk(self, upload_id, chunk_index, chunk):
+        """上传单个文件分块，返回服务器响应"""
+        return self.session.post(
+            f"{self.server_url}/api/file/upload_chunk",
+            files={'file': (f'chunk_{chunk_index}', chunk)},
+            data={
+                'upload_id': upload_id,
+                'chunk_index': chunk_index
+            }
+        )
+    
+    def upload_file_in_chunks(self, file_path, file_size=None):
+        """以分块方式上传大文件，调用方已知文件大小时可通过file_size传入"""
         try:
-            file_size = os.path.getsize(file_path)
+            if file_size is None:
+                file_size = os.stat(file_path).st_size
             file_name = os.path.basename(file_path)
             
-            logger.info(f"开始分块上传文件: {file_name} (大小: {file_size / (1024*1024):.2f} MB)")
+            logger.info("开始分块上传文件: %s (大小: %.2f MB)", file_name, file_size / (1024*1024))
+            
+            # 先计算文件摘要：服务器已有相同文件时可以跳过上传，合并后也用它校验
+            with open(file_path, 'rb') as f:
+                sha256 = hashlib.file_digest(f, 'sha256').hexdigest()
             
             # 初始化上传
-            init_response = requests.post(
-                f"{self.server_url}/api/file/init_upload",
-                json={
+            init_response, init_data = self._post_json(
+                "/api/file/init_upload",
+                {
                     "filename": file_name,
                     "file_size": file_size,
-                    "file_type": os.path.splitext(file_name)[1][1:]  # 文件类型（不含点）
+                    "file_type": os.path.splitext(file_name)[1][1:],  # 文件类型（不含点）
+                    "sha256": sha256
                 }
             )
             
             if init_response.status_code != 200:
-                logger.error(f"初始化文件上传失败: {init_response.status_code} - {init_response.text}")
+                logger.error("初始化文件上传失败: %s - %s", init_response.status_code, init_response.text)
                 return False, None
             
-            init_data = init_response.json()
+            if init_data.get('complete', False):
+                logger.info("服务器已有相同文件，跳过上传: %s", file_name)
+                return True, init_data.get('filename', file_name)
+            
             upload_id = init_data.get('upload_id')
             chunk_size = init_data.get('chunk_size')
             total_chunks = init_data.get('total_chunks')
             
-            logger.info(f"文件上传初始化成功，上传ID: {upload_id}, 共分 {total_chunks} 块")
+            logger.info("文件上传初始化成功，上传ID: %s, 共分 %s 块", upload_id, total_chunks)
             
-            # 分块上传
-            with open(file_path, 'rb') as f:
-                for chunk_index in range(total_chunks):
-                    chunk_data = f.read(chunk_size)
-                    
-                    # 准备上传表单
-                    files = {'file': (f'chunk_{chunk_index}', chunk_data)}
-                    data = {
-                        'upload_id': upload_id,
-                        'chunk_index': chunk_index
-                    }
-                    
-                    # 上传分块
-                    chunk_response = requests.post(
-                        f"{self.server_url}/api/file/upload_chunk",
-                        files=files,
-                        data=data
-                    )
-                    
-                    if chunk_response.status_code != 200:
-                        logger.error(f"上传分块 {chunk_index} 失败: {chunk_response.status_code} - {chunk_response.text}")
+            # 分块并发上传：主线程按顺序读取分块，线程池并发发送。
+            # 缓冲区池限制了同时驻留内存的分块数量，每块缓冲区在整个文件上传过程中复用
+            buffer_pool = queue.Queue()
+            for _ in range(CHUNK_UPLOAD_WORKERS + 1):
+                buffer_pool.put(bytearray(chunk_size))
+            
+            def send_chunk(chunk_index, chunk_buffer, bytes_read):
+                try:
+                    return self._upload_chunk(upload_id, chunk_index, memoryview(chunk_buffer)[:bytes_read])
+                finally:
+                    buffer_pool.put(chunk_buffer)
+            
+            progress = {'done': 0, 'complete': False, 'logged_at': 0.0}
+            
+            def check_chunk(future, chunk_index):
+                """检查已完成分块的响应，失败时返回False"""
+                chunk_response = future.result()
+                if chunk_response.status_code != 200:
+                    logger.error("上传分块 %d 失败: %s - %s", chunk_index, chunk_response.status_code, chunk_response.text)
+                    return False
+                
+                # 最后到达的分块由服务器合并，只有一个分块的响应会标记为完成
+                if _parse_json(chunk_response).get('complete', False):
+                    progress['complete'] = True
+                
+                # 进度日志按时间间隔输出，分块很小时不会刷屏
+                progress['done'] += 1
+                done = progress['done']
+                now = time.monotonic()
+                if now - progress['logged_at'] >= PROGRESS_LOG_INTERVAL or done == total_chunks:
+                    progress['logged_at'] = now
+                    logger.info("上传进度: %d/%d (%.1f%%)", done, total_chunks, done / total_chunks * 100)
+                return True
+            
+            pending = {}
+            executor = ThreadPoolExecutor(max_workers=CHUNK_UPLOAD_WORKERS)
+            try:
+                with open(file_path, 'rb') as f:
+                    for chunk_index in range(total_chunks):
+                        # 没有空闲缓冲区时在这里等待，直到有分块发送完成
+                        chunk_buffer = buffer_pool.get()
+                        bytes_read = f.readinto(chunk_buffer)
+                        pending[executor.submit(send_chunk, chunk_index, chunk_buffer, bytes_read)] = chunk_index
+                        
+                        # 处理已经完成的分块，有分块失败时不再继续读取和提交
+                        for future in [fut for fut in pending if fut.done()]:
+                            if not check_chunk(future, pending.pop(future)):
+                                return False, None
+                
+                for future in as_completed(pending):
+                    if not check_chunk(future, pending[future]):
                         return False, None
-                    
-                    chunk_data = chunk_response.json()
-                    if chunk_data.get('complete', False):
-                        logger.info(f"文件上传完成: {file_name}")
-                        return True, file_name
-                    
-                    # 进度日志
-                    if chunk_index % 5 == 0 or chunk_index == total_chunks - 1:
-                        logger.info(f"上传进度: {chunk_index + 1}/{total_chunks} ({(chunk_index + 1) / total_chunks * 100:.1f}%)")
+            finally:
+                # 出错时取消尚未开始的分块
+                executor.shutdown(cancel_futures=True)
+            
+            if progress['complete']:
+                logger.info("文件上传完成: %s", file_name)
+                return True, file_name
             
             # 如果没有在上面返回，可能是出了问题
             logger.error("文件上传未完成，但所有块已处理")
             return False, None
             
         except Exception as e:
-            logger.error(f"分块上传文件出错: {str(e)}")
+            logger.error("分块上传文件出错: %s", e)
             return False, None
     
     def upload_file(self, file_path):
         """上传文件到服务器，对于大文件使用分块上传"""
         # 检查文件大小，大于10MB的文件使用分块上传
-        file_size = os.path.getsize(file_path)
-        if file_size > 10 * 1024 * 1024:  # 10MB
-            return self.upload_file_in_chunks(file_path)
+        file_size = os.stat(file_path).st_size
+        if file_size > CHUNKED_UPLOAD_THRESHOLD:
+            return self.upload_file_in_chunks(file_path, file_size)
         
         # 小文件使用普通上传
         try:
-            with open(file_path, 'rb') as f:
-                files = {'file': (os.path.basename(file_path), f)}
-                response = requests.post(
-                    f"{self.server_url}/api/file/upload",
-                    files=files
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    logger.info(f"文件上传成功: {file_path}")
-                    return True, data.get('filename')
-                else:
-                    logger.error(f"文件上传失败: {response.status_code} - {response.text}")
-                    return False, None
+            response = self._post_multipart("/api/file/upload", {}, {'file': file_path})
+            
+            if response.status_code == 200:
+                data = _parse_json(response)
+                logger.info(f"文件上传成功: {file_path}")
+                return True, data.get('filename')
+            else:
+                logger.error(f"文件上传失败: {response.status_code} - {response.text}")
+                return False, None
         except Exception as e:
             logger.error(f"文件上传出错: {str(e)}")
             return False, None
     
     def report_task_completion(self, task_id, result):
-        """上报任务完成状态"""
+        """上报任务完成状态，音频和字幕文件随上报请求一起上传"""
         try:
-            # 上传音频文件
-            audio_upload_success, audio_filename = self.upload_file(result['audio_path'])
-            
-            # 上传字幕文件
-            subtitle_upload_success, subtitle_filename = self.upload_file(result['subtitle_path'])
-            
-            # 报告任务完成状态
             data = {
                 "task_id": task_id,
                 "client_id": self.client_id,
                 "title": result['title'],
-                "description": result['description'],
-                "error_message": None
+                "description": result['description']
             }
+            upload_paths = {'subtitle': result['subtitle_path']}
+            
+            # 大音频文件先分块上传，上报时只带上文件名；小文件直接放进上报请求
+            audio_size = os.stat(result['audio_path']).st_size
+            if audio_size > CHUNKED_UPLOAD_THRESHOLD:
+                audio_upload_success, audio_filename = self.upload_file_in_chunks(result['audio_path'], audio_size)
+                if audio_upload_success:
+                    data["audio_filename"] = audio_filename
+            else:
+                upload_paths['audio'] = result['audio_path']
             
-            if audio_upload_success:
-                data["audio_filename"] = audio_filename
-            
-            if subtitle_upload_success:
-                data["subtitle_filename"] = subtitle_filename
-            
-            response = requests.post(
-                f"{self.server_url}/api/tasks/complete",
-                json=data
-            )
+            response = self._post_multipart("/api/tasks/complete", data, upload_paths)
             
             if response.status_code == 200:
                 logger.info(f"任务完成状态上报成功: {task_id}")
@@ -272,10 +528,7 @@ class YouTubeTaskLoader:
                 "error_message": error_message
             }
             
-            response = requests.post(
-                f"{self.server_url}/api/tasks/complete",
-                json=data
-            )
+            response, _ = self._post_json("/api/tasks/complete", data)
             
             if response.status_code == 200:
                 logger.info(f"任务失败状态上报成功: {task_id}")
@@ -288,98 +541,81 @@ class YouTubeTaskLoader:
             return False
     
     def process_task(self, task):
-        """处理单个任务"""
+        """
+        处理单个任务
+        
+        返回True表示处理成功，False表示认领后处理失败，None表示未能认领任务
+        """
         task_id = task['id']
         youtube_url = task['youtube_url']
+        # 任务日期只在开始时取一次，成功和失败分支都用它给文件加前缀
+        task_date = time.strftime('%Y%m%d')
         
-        logger.info(f"开始处理任务 {task_id}: {youtube_url}")
+        logger.info("开始处理任务 %s: %s", task_id, youtube_url)
         
         try:
             # 认领任务
             claim_success, claimed_task = self.claim_task(task_id)
             if not claim_success:
-                logger.error(f"认领任务失败，跳过处理: {task_id}")
-                return False
-            
-            # 修改DOWNLOAD_DIR环境变量，让youtube_content_extractor使用临时目录
-            original_download_dir = youtube_content_extractor.DOWNLOAD_DIR
-            youtube_content_extractor.DOWNLOAD_DIR = self.temp_dir
-            
-            # 为处理设置超时机制
-            import threading
-            import traceback
+                logger.error("认领任务失败，跳过处理: %s", task_id)
+                return None
             
-            # 结果容器和错误标志
-            result_container = {'result': None, 'error': None}
-            processing_complete = threading.Event()
-            
-            def process_with_timeout():
-                try:
-                    # 调用 youtube_content_extractor 处理下载和转录
-                    result_container['result'] = youtube_content_extractor.process_youtube_video(youtube_url)
-                    processing_complete.set()
-                except Exception as e:
-                    result_container['error'] = f"处理异常: {str(e)}\n{traceback.format_exc()}"
-                    processing_complete.set()
-            
-            # 创建处理线程
-            processing_thread = threading.Thread(target=process_with_timeout)
-            processing_thread.daemon = True
+            logger.info("开始下载和转录: %s", youtube_url)
             
+            # 等待处理完成，设置超时时间（例如30分钟）
+            timeout_seconds = 30 * 60  # 30分钟超时
             try:
-                logger.info(f"开始下载和转录: {youtube_url}")
-                processing_thread.start()
-                
-                # 等待处理完成，设置超时时间（例如30分钟）
-                timeout_seconds = 30 * 60  # 30分钟超时
-                if not processing_complete.wait(timeout_seconds):
-                    raise TimeoutError(f"处理超时（{timeout_seconds}秒）")
-                
-                # 检查是否有错误
-                if result_container['error']:
-                    raise Exception(result_container['error'])
-                
-                # 获取处理结果
-                result = result_container['result']
-                
-                if not result:
-                    raise Exception("处理返回空结果")
-                
-                if not result.get('audio_path') or not result.get('subtitle_path'):
-                    # 检查是否至少有音频文件
-                    if result.get('audio_path') and not result.get('subtitle_path'):
-                        logger.warning("没有生成字幕文件，但音频文件已下载。尝试手动生成简单字幕文件。")
-                        
-                        # 创建一个简单的字幕文件
-                        audio_path = result.get('audio_path')
-                        simple_subtitle_path = os.path.splitext(audio_path)[0] + ".txt"
-                        
-                        with open(simple_subtitle_path, 'w', encoding='utf-8') as f:
-                            f.write(f"[自动生成] 该视频的转录失败，但音频已成功下载。\n")
-                            f.write(f"视频标题: {result.get('title', '未知')}\n")
-                            f.write(f"下载时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                        
-                        result['subtitle_path'] = simple_subtitle_path
-                    else:
-                        raise Exception("处理结果不完整，缺少音频或字幕文件路径")
-            finally:
-                # 恢复原始下载目录设置
-                youtube_content_extractor.DOWNLOAD_DIR = original_download_dir
-                
-            # 获取当前日期，格式为 YYYYMMDD
-            current_date = datetime.now().strftime('%Y%m%d')
+                # 在独立的工作进程中下载和转录，超时后可以直接结束进程，释放显存和文件句柄
+                try:
+                    future = self._worker.submit(_extract_worker, youtube_url, self.temp_dir)
+                except (BrokenProcessPool, RuntimeError):
+                    # 工作进程可能在空闲时退出（例如被OOM结束或预热时崩溃），进程池不再接受任务，重建后重新提交
+                    logger.warning("工作进程已退出，重新创建")
+                    self._restart_worker()
+                    future = self._worker.submit(_extract_worker, youtube_url, self.temp_dir)
+                result = future.result(timeout=timeout_seconds)
+            except TimeoutError:
+                self._restart_worker()
+                raise TimeoutError(f"处理超时（{timeout_seconds}秒）")
+            except BrokenProcessPool:
+                # 工作进程异常退出（例如CUDA错误导致崩溃），重建后再处理后续任务
+                self._restart_worker()
+                raise Exception("处理进程异常退出")
+            
+            if not result:
+                raise Exception("处理返回空结果")
+            
+            if not result.get('audio_path') or not result.get('subtitle_path'):
+                # 检查是否至少有音频文件
+                if result.get('audio_path') and not result.get('subtitle_path'):
+                    logger.warning("没有生成字幕文件，但音频文件已下载。尝试手动生成简单字幕文件。")
+                    
+                    # 创建一个简单的字幕文件
+                    audio_path = result.get('audio_path')
+                    simple_subtitle_path = os.path.splitext(audio_path)[0] + ".txt"
+                    
+                    with open(simple_subtitle_path, 'w', encoding='utf-8') as f:
+                        f.write(f"[自动生成] 该视频的转录失败，但音频已成功下载。\n")
+                        f.write(f"视频标题: {result.get('title', '未知')}\n")
+                        f.write(f"下载时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+                    
+                    result['subtitle_path'] = simple_subtitle_path
+                else:
+                    raise Exception("处理结果不完整，缺少音频或字幕文件路径")
             
             # 重命名文件，添加任务ID和日期前缀
-            new_audio_filename = f"{task_id}_{current_date}{os.path.splitext(os.path.basename(result['audio_path']))[1]}"
-            new_subtitle_filename = f"{task_id}_{current_date}{os.path.splitext(os.path.basename(result['subtitle_path']))[1]}"
+            audio_ext = os.path.splitext(result['audio_path'])[1]
+            subtitle_ext = os.path.splitext(result['subtitle_path'])[1]
+            new_audio_filename = f"{task_id}_{task_date}{audio_ext}"
+            new_subtitle_filename = f"{task_id}_{task_date}{subtitle_ext}"
             
             # 创建新的临时文件路径
             new_audio_path = os.path.join(self.temp_dir, new_audio_filename)
             new_subtitle_path = os.path.join(self.temp_dir, new_subtitle_filename)
             
-            # 重命名文件
-            shutil.copy(result['audio_path'], new_audio_path)
-            shutil.copy(result['subtitle_path'], new_subtitle_path)
+            # 重命名文件（源文件和目标都在临时目录中，直接重命名，无需复制文件内容）
+            os.replace(result['audio_path'], new_audio_path)
+            os.replace(result['subtitle_path'], new_subtitle_path)
             
             # 更新结果中的文件路径
             result['audio_path'] = new_audio_path
@@ -392,10 +628,10 @@ class YouTubeTaskLoader:
             self.cleanup()
             
             if completion_success:
-                logger.info(f"任务处理完成: {task_id}")
+                logger.info("任务处理完成: %s", task_id)
                 return True
             else:
-                logger.error(f"任务完成状态上报失败: {task_id}")
+                logger.error("任务完成状态上报失败: %s", task_id)
                 return False
                 
         except TimeoutError as e:
@@ -404,46 +640,10 @@ class YouTubeTaskLoader:
             self.report_task_error(task_id, error_message)
             
             # 检查是否有部分结果可用（例如仅音频）
-            audio_files = [f for f in os.listdir(self.temp_dir) if f.endswith('.mp3')]
-            if audio_files:
-                try:
-                    # 找到与当前任务相关的音频文件
-                    audio_file = audio_files[0]  # 假设只有一个音频文件
-                    audio_path = os.path.join(self.temp_dir, audio_file)
-                    
-                    # 创建一个简单的字幕文件
-                    simple_subtitle_path = os.path.splitext(audio_path)[0] + ".txt"
-                    with open(simple_subtitle_path, 'w', encoding='utf-8') as f:
-                        f.write(f"[自动生成] 该视频转录过程超时，但音频已成功下载。\n")
-                        f.write(f"处理时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                    
-                    # 获取当前日期，格式为 YYYYMMDD
-                    current_date = datetime.now().strftime('%Y%m%d')
-                    
-                    # 重命名文件，添加任务ID和日期前缀
-                    new_audio_filename = f"{task_id}_{current_date}.mp3"
-                    new_subtitle_filename = f"{task_id}_{current_date}.txt"
-                    
-                    new_audio_path = os.path.join(self.temp_dir, new_audio_filename)
-                    new_subtitle_path = os.path.join(self.temp_dir, new_subtitle_filename)
-                    
-                    # 重命名文件
-                    shutil.copy(audio_path, new_audio_path)
-                    shutil.copy(simple_subtitle_path, new_subtitle_path)
-                    
-                    # 构建部分结果
-                    partial_result = {
-                        'title': f"[部分结果] 任务 {task_id} - {datetime.now().strftime('%Y-%m-%d')}",
-                        'description': "转录过程超时，仅提供音频文件。",
-                        'audio_path': new_audio_path,
-                        'subtitle_path': new_subtitle_path
-                    }
-                    
-                    # 上报部分完成
-                    logger.info(f"转录失败但上传部分结果(音频): {task_id}")
-                    self.report_task_completion(task_id, partial_result)
-                except Exception as partial_error:
-                    logger.error(f"尝试保存部分结果时出错: {str(partial_error)}")
+            partial_result = self._salvage_partial(task_id, task_date, "该视频转录过程超时", "转录过程超时")
+            if partial_result:
+                logger.info("转录失败但上传部分结果(音频): %s", task_id)
+                self.report_task_completion(task_id, partial_result)
             
             # 清理临时文件
             self.cleanup()
@@ -452,82 +652,106 @@ class YouTubeTaskLoader:
         except Exception as e:
             error_message = f"处理任务出错: {str(e)}"
             logger.error(error_message)
-            # 记录详细堆栈跟踪
-            logger.error(traceback.format_exc())
+            # 记录详细堆栈跟踪（格式化堆栈开销较大，日志级别关闭时跳过）
+            if logger.isEnabledFor(logging.ERROR):
+                logger.error(traceback.format_exc())
             self.report_task_error(task_id, error_message)
             
             # 检查是否有部分结果可用（例如仅音频）
-            try:
-                audio_files = [f for f in os.listdir(self.temp_dir) if f.endswith('.mp3')]
-                if audio_files:
-                    # 找到与当前任务相关的音频文件
-                    audio_file = audio_files[0]  # 假设只有一个音频文件
-                    audio_path = os.path.join(self.temp_dir, audio_file)
-                    
-                    # 创建一个简单的字幕文件
-                    simple_subtitle_path = os.path.splitext(audio_path)[0] + ".txt"
-                    with open(simple_subtitle_path, 'w', encoding='utf-8') as f:
-                        f.write(f"[自动生成] 该视频转录失败，但音频已成功下载。\n")
-                        f.write(f"错误信息: {str(e)}\n")
-                        f.write(f"处理时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                    
-                    # 获取当前日期，格式为 YYYYMMDD
-                    current_date = datetime.now().strftime('%Y%m%d')
-                    
-                    # 重命名文件，添加任务ID和日期前缀
-                    new_audio_filename = f"{task_id}_{current_date}.mp3"
-                    new_subtitle_filename = f"{task_id}_{current_date}.txt"
-                    
-                    new_audio_path = os.path.join(self.temp_dir, new_audio_filename)
-                    new_subtitle_path = os.path.join(self.temp_dir, new_subtitle_filename)
-                    
-                    # 重命名文件
-                    shutil.copy(audio_path, new_audio_path)
-                    shutil.copy(simple_subtitle_path, new_subtitle_path)
-                    
-                    # 构建部分结果
-                    partial_result = {
-                        'title': f"[部分结果] 任务 {task_id} - {datetime.now().strftime('%Y-%m-%d')}",
-                        'description': "转录过程出错，仅提供音频文件。",
-                        'audio_path': new_audio_path,
-                        'subtitle_path': new_subtitle_path
-                    }
-                    
-                    # 上报部分完成
-                    logger.info(f"转录失败但上传部分结果(音频): {task_id}")
-                    self.report_task_completion(task_id, partial_result)
-            except Exception as partial_error:
-                logger.error(f"尝试保存部分结果时出错: {str(partial_error)}")
+            partial_result = self._salvage_partial(task_id, task_date, "该视频转录失败", "转录过程出错", str(e))
+            if partial_result:
+                logger.info("转录失败但上传部分结果(音频): %s", task_id)
+                self.report_task_completion(task_id, partial_result)
             
             # 清理临时文件
             self.cleanup()
             return False
     
+    def _salvage_partial(self, task_id, task_date, subtitle_notice, reason, error_detail=None):
+        """
+        处理失败后，用已下载的音频和一个说明性字幕文件构建部分结果
+        
+        参数:
+            task_date: 任务日期（YYYYMMDD），用作文件名前缀
+            subtitle_notice: 写入字幕文件的失败说明
+            reason: 失败原因，用于结果描述
+            error_detail: 写入字幕文件的错误信息（可选）
+        
+        返回部分结果字典，没有可用的音频或处理出错时返回None
+        """
+        try:
+            # 找到第一个音频文件即停止扫描（临时目录中只有当前任务的文件）
+            audio_path = _find_audio_file(self.temp_dir)
+            if not audio_path:
+                return None
+            
+            # 创建一个简单的字幕文件
+            simple_subtitle_path = os.path.splitext(audio_path)[0] + ".txt"
+            with open(simple_subtitle_path, 'w', encoding='utf-8') as f:
+                f.write(f"[自动生成] {subtitle_notice}，但音频已成功下载。\n")
+                if error_detail:
+                    f.write(f"错误信息: {error_detail}\n")
+                f.write(f"处理时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            
+            # 重命名文件，添加任务ID和日期前缀
+            new_audio_path = os.path.join(self.temp_dir, f"{task_id}_{task_date}.mp3")
+            new_subtitle_path = os.path.join(self.temp_dir, f"{task_id}_{task_date}.txt")
+            os.replace(audio_path, new_audio_path)
+            os.replace(simple_subtitle_path, new_subtitle_path)
+            
+            # 构建部分结果
+            return {
+                'title': f"[部分结果] 任务 {task_id} - {datetime.now().strftime('%Y-%m-%d')}",
+                'description': f"{reason}，仅提供音频文件。",
+                'audio_path': new_audio_path,
+                'subtitle_path': new_subtitle_path
+            }
+        except Exception as partial_error:
+            logger.error("尝试保存部分结果时出错: %s", partial_error)
+            return None
+    
     def run(self):
         """主循环，持续检查并处理任务"""
         logger.info("开始监控新任务...")
         
+        # 启动时和处理完任务后直接获取待处理任务（没有任务时接口返回空列表），
+        # 只有确认没有任务时才长轮询等待
+        has_new_tasks = True
         while True:
             try:
-                # 检查是否有新任务
-                has_new_tasks = self.check_new_tasks()
-                
                 if has_new_tasks:
-                    logger.info("检测到新任务，正在获取详情...")
                     pending_tasks = self.get_pending_tasks()
                     
+                    if pending_tasks is None:
+                        # 请求失败时等待后重试，不去长轮询（新任务接口仍会返回True，导致反复请求）
+                        time.sleep(self.check_interval)
+                        continue
+                    
                     if pending_tasks:
+                        # 一个任务都没能认领时（例如服务器出错），等待后再重试，避免反复请求同一批任务
+                        claimed_any = False
                         for task in pending_tasks:
-                            self.process_task(task)
-                    else:
-                        logger.info("没有找到待处理的任务")
+                            if self.process_task(task) is not None:
+                                claimed_any = True
+                        if not claimed_any:
+                            time.sleep(self.check_interval)
+                        continue
                 
-                # 等待下一次检查
-                time.sleep(self.check_interval)
+                # 长轮询等待新任务，服务器在有新任务时立即返回
+                has_new_tasks = self.check_new_tasks(wait=LONG_POLL_TIMEOUT)
+                
+                if has_new_tasks is None:
+                    # 请求失败时退回到按间隔重试
+                    time.sleep(self.check_interval)
+                    has_new_tasks = True
+                elif has_new_tasks:
+                    logger.info("检测到新任务，正在获取详情...")
                 
             except KeyboardInterrupt:
                 logger.info("收到终止信号，正在停止...")
                 self.cleanup()
+                self.session.close()
+                self._worker.shutdown(cancel_futures=True)
                 break
             except Exception as e:
                 logger.error(f"主循环出错: {str(e)}")
@@ -539,19 +763,23 @@ def main():
     parser.add_argument('--server', type=str, default='http://localhost:5000',
                         help='服务器地址 (默认: http://localhost:5000)')
     parser.add_argument('--interval', type=int, default=10,
-                        help='检查新任务的间隔时间（秒）(默认: 10)')
+                        help='检查新任务失败后的重试间隔（秒）(默认: 10)')
     parser.add_argument('--temp-dir', type=str, default=None,
                         help='临时文件的保存目录 (默认: 程序同级目录下的temp文件夹)')
     
     args = parser.parse_args()
     
-    task_loader = YouTubeTaskLoader(
-        server_url=args.server,
-        check_interval=args.interval,
-        download_dir=args.temp_dir
-    )
-    
-    task_loader.run()
+    log_listener = _setup_logging()
+    try:
+        task_loader = YouTubeTaskLoader(
+            server_url=args.server,
+            check_interval=args.interval,
+            download_dir=args.temp_dir
+        )
+        
+        task_loader.run()
+    finally:
+        log_listener.stop()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -6,11 +6,60 @@ import os
 import json
 import math
 import shutil
+import tempfile
+import threading
 from datetime import datetime, UTC, timedelta
+from flask import Request, current_app
+from flask_caching import Cache
 from werkzeug.utils import secure_filename
 
-# Global variable for task notification
-has_new_tasks = True
+# 页面查询缓存（首页最近任务、字幕列表），任务状态变化时主动失效
+cache = Cache()
+
+class NewTaskNotifier:
+    """
+    新任务通知：提交任务时递增代数并唤醒所有在 /api/tasks/new 上长轮询的客户端（每个进程一份）
+    
+    等待方在查询数据库之前记下当前代数，之后只要代数发生变化就说明期间有新任务提交。
+    不需要清除状态，多个客户端同时长轮询时不会互相吞掉通知。
+    """
+    
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._generation = 0
+    
+    @property
+    def generation(self):
+        """当前代数，每提交一次新任务加一"""
+        with self._condition:
+            return self._generation
+    
+    def set(self):
+        """通知有新任务提交"""
+        with self._condition:
+            self._generation += 1
+            self._condition.notify_all()
+    
+    def wait(self, generation, timeout):
+        """等待代数不同于 generation，返回等待结束时是否有新任务提交"""
+        with self._condition:
+            return self._condition.wait_for(lambda: self._generation != generation, timeout)
+
+new_task_event = NewTaskNotifier()
+
+class UploadRequest(Request):
+    """
+    上传内容较大时，把接收文件用的临时文件直接建在上传临时目录中，
+    保存分块时可以硬链接到目标位置，省去一次完整的拷贝
+    """
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # 与 werkzeug 默认的 500KB 落盘阈值保持一致
+        if total_content_length is not None and total_content_length > 500 * 1024:
+            return tempfile.NamedTemporaryFile(
+                'wb+', dir=current_app.config['TEMP_UPLOAD_FOLDER'], prefix='.incoming_'
+            )
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
 
 def process_video_task(app, task_id, youtube_url):
     """处理视频下载任务的后台函数"""
@@ -62,9 +111,14 @@ def check_storage_limit(app, additional_size=0):
 
 def get_directory_size(path):
     """计算目录的总大小（字节）"""
+    # 用 scandir 遍历，目录项自带文件类型，不需要再逐个 stat 判断
     total_size = 0
-    for dirpath, dirnames, filenames in os.walk(path):
-        for f in filenames:
-            fp = os.path.join(dirpath, f)
-            total_size += os.path.getsize(fp)
+    stack = [path]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False):
+                    total_size += entry.stat(follow_symlinks=False).st_size
+                elif entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
     return total_size
\ No newline at end of file
@@ -49,93 +49,181 @@ process_youtube_video(youtube_url)
 - download_audio(youtube_url, output_path): 仅下载视频的音频部分
 - transcribe_audio(audio_path, model_name, use_gpu, num_threads): 使用 faster-whisper 转录音频文件
 
+日志:
+- 日志写入 extractor_debug.log，默认级别为 INFO，可通过环境变量 YOUTUBEDL_EXTRACTOR_LOG_LEVEL（例如 DEBUG）调整
+
 文件存储位置:
 - 音频文件存储在 DOWNLOAD_DIR 目录下 (默认为 './download/')
 - 字幕文件也存储在 DOWNLOAD_DIR 目录下
 """
 
 import os
+import re
 import sys
 import subprocess
 import yt_dlp
 import traceback
 import logging
-from faster_whisper import WhisperModel
+from logging.handlers import RotatingFileHandler
+import queue
+import threading
+import urllib.request
+from faster_whisper import WhisperModel, BatchedInferencePipeline, decode_audio
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
-# 配置详细的日志记录器
-logger = logging.getLogger('youtube_extractor')
-logger.setLevel(logging.DEBUG)
-
-# 创建文件处理器，记录到文件
-log_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'extractor_debug.log')
-file_handler = logging.FileHandler(log_file, encoding='utf-8')
-file_handler.setLevel(logging.DEBUG)
+try:
+    import torch
+except Exception:
+    # 未安装torch或CUDA库加载失败时只使用CPU
+    torch = None
 
-# 创建控制台处理器，显示在控制台
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
+# CUDA 检测结果 (是否可用, 计算能力)，第一次使用时检测一次并缓存
+_CUDA_INFO = None
 
-# 创建格式器并添加到处理器
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(formatter)
-console_handler.setFormatter(formatter)
+# 配置日志记录器，默认只记录INFO及以上级别；
+# 需要GPU状态等调试信息时设置环境变量 YOUTUBEDL_EXTRACTOR_LOG_LEVEL=DEBUG
+logger = logging.getLogger('youtube_extractor')
+_log_level = logging.getLevelName(os.environ.get('YOUTUBEDL_EXTRACTOR_LOG_LEVEL', 'INFO').upper())
+logger.setLevel(_log_level if isinstance(_log_level, int) else logging.INFO)
+# 日志只由下面的处理器输出，不再传递给根日志记录器，避免重复输出
+logger.propagate = False
 
-# 添加处理器到日志记录器
-logger.addHandler(file_handler)
-logger.addHandler(console_handler)
+# 模块被重新加载时日志记录器已经带有处理器，不再重复添加
+if not logger.handlers:
+    # 创建文件处理器，记录到文件（单个文件最大10MB，保留3个历史文件）
+    log_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'extractor_debug.log')
+    file_handler = RotatingFileHandler(log_file, maxBytes=10 * 1024 * 1024, backupCount=3, encoding='utf-8')
+    file_handler.setLevel(logging.DEBUG)
+    
+    # 创建控制台处理器，显示在控制台
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    
+    # 创建格式器并添加到处理器
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    file_handler.setFormatter(formatter)
+    console_handler.setFormatter(formatter)
+    
+    # 添加处理器到日志记录器
+    logger.addHandler(file_handler)
+    logger.addHandler(console_handler)
 
 # 设置下载目录常量
 DOWNLOAD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'download')
+os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+
+# 写入字幕文件时的缓冲区大小（1MB），以二进制方式写入已编码的UTF-8内容，减少write调用
+_WRITE_BUFFER_SIZE = 1 << 20
+
+# 预编译的正则表达式
+_TITLE_RE = re.compile(r'[^\u4e00-\u9fa5a-zA-Z0-9]')
+_WEBVTT_HEADER_RE = re.compile(r'^WEBVTT.*?\n\n', re.DOTALL)
+# 一条VTT字幕：时间戳行，加上其后直到空行或下一个时间戳行为止的文本行
+_VTT_TS = r'\d{2}:\d{2}:\d{2}\.\d{3}'
+_VTT_CUE_RE = re.compile(
+    rf'({_VTT_TS}) --> ({_VTT_TS})[^\n]*\n'
+    rf'((?:(?![^\n]*{_VTT_TS} --> {_VTT_TS})[^\n]*\S[^\n]*(?:\n|$))+)'
+)
+
+# 已加载的模型缓存，键为 (model_name, device, compute_type, cpu_threads)
+# 同一进程中重复转录或降级重试时复用已加载的模型，避免重复读取权重
+_MODEL_CACHE = {}
+# 批量处理时下载线程预加载模型，与转录线程共用缓存
+_MODEL_LOCK = threading.Lock()
+
+# Whisper 模型使用的采样率
+SAMPLING_RATE = 16000
+
+# 转录参数：使用批量推理，由内置的 Silero VAD 切分语音片段并跳过静音。
+# 批量推理会把 condition_on_previous_text 强制设为 False，各片段独立解码，减少长静音处的重复幻觉输出；
+# without_timestamps 在批量推理下默认为 True，只会按 VAD 片段输出约 30 秒一段，这里关闭以得到逐句的字幕段落
+TRANSCRIBE_OPTIONS = {
+    'beam_size': 5,
+    'batch_size': 16,
+    'without_timestamps': False,
+    'vad_filter': True,
+    'vad_parameters': {'min_silence_duration_ms': 500},
+}
+
+def _get_model(model_name, device, compute_type, cpu_threads=0):
+    """Return a cached WhisperModel for the given settings, loading it on first use"""
+    key = (model_name, device, compute_type, cpu_threads)
+    with _MODEL_LOCK:
+        model = _MODEL_CACHE.get(key)
+        if model is None:
+            logger.debug(f'初始化WhisperModel: {key}')
+            model = WhisperModel(model_name, device=device, compute_type=compute_type, cpu_threads=cpu_threads)
+            _MODEL_CACHE[key] = model
+        else:
+            logger.debug(f'复用已加载的WhisperModel: {key}')
+    return model
+
+def clear_model_cache():
+    """Drop all cached WhisperModel instances"""
+    with _MODEL_LOCK:
+        _MODEL_CACHE.clear()
 
-def get_video_title(youtube_url):
-    """Extract video title from YouTube URL"""
+def _extract_info(youtube_url):
+    """Fetch the video metadata from YouTube without downloading anything"""
     ydl_opts = {
         'quiet': True,
         'skip_download': True,
         'no_warnings': True,
     }
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        info = ydl.extract_info(youtube_url, download=False)
-        title = info.get('title', 'unknown_video')
-        
-        # 只保留汉字、英文和数字
-        import re
-        title = re.sub(r'[^\u4e00-\u9fa5a-zA-Z0-9]', '', title)
-        
-        # Trim title to 25 characters max
-        if len(title) > 25:
-            title = title[:25]
+        return ydl.extract_info(youtube_url, download=False)
+
+def get_video_title(youtube_url, info=None):
+    """Extract video title from YouTube URL, reusing info from a previous extract_info call if given"""
+    if info is None:
+        info = _extract_info(youtube_url)
+    title = info.get('title', 'unknown_video')
+    
+    # 只保留汉字、英文和数字
+    title = _TITLE_RE.sub('', title)
+    
+    # Trim title to 25 characters max
+    if len(title) > 25:
+        title = title[:25]
+    
+    # Ensure we have a valid, non-empty filename
+    title = title.strip()
+    if not title:
+        title = "untitled_video"
         
-        # Ensure we have a valid, non-empty filename
-        title = title.strip()
-        if not title:
-            title = "untitled_video"
-            
-        return title
+    return title
 
 def get_video_info(youtube_url):
     """Get video information including title and description"""
-    ydl_opts = {
-        'quiet': True,
-        'skip_download': True,
-        'no_warnings': True,
+    info = _extract_info(youtube_url)
+    title = info.get('title', 'unknown_video')
+    description = info.get('description', '')
+    
+    return {
+        'title': title,
+        'description': description,
+        'raw_info': info
     }
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        info = ydl.extract_info(youtube_url, download=False)
-        title = info.get('title', 'unknown_video')
-        description = info.get('description', '')
-        
-        return {
-            'title': title,
-            'description': description,
-            'raw_info': info
-        }
 
-def check_and_download_subtitles(youtube_url, output_file):
+def _fetch_subtitle_text(subtitle_entries):
+    """Download a VTT subtitle straight from the URL listed in the video info, returns None if no VTT entry is listed"""
+    for entry in subtitle_entries:
+        if entry.get('ext') == 'vtt' and entry.get('url'):
+            request = urllib.request.Request(entry['url'], headers=entry.get('http_headers') or {})
+            with urllib.request.urlopen(request, timeout=30) as response:
+                content = response.read().decode('utf-8')
+            # 与文本模式读取文件时一样统一换行符
+            return content.replace('\r\n', '\n').replace('\r', '\n')
+    return None
+
+def check_and_download_subtitles(youtube_url, output_file, info=None):
     """
     Check if Chinese subtitles are available for the video and download them if found
     
+    Parameters:
+        info: Video info from a previous extract_info call, fetched again when None
+    
     Returns:
         bool: True if subtitles were downloaded, False otherwise
     """
@@ -144,109 +232,83 @@ def check_and_download_subtitles(youtube_url, output_file):
     # 确保输出文件包含完整路径
     output_file_path = os.path.join(DOWNLOAD_DIR, output_file)
     
-    # 确保下载目录存在
-    if not os.path.exists(DOWNLOAD_DIR):
-        os.makedirs(DOWNLOAD_DIR)
+    if info is None:
+        info = _extract_info(youtube_url)
     
-    ydl_opts = {
-        'skip_download': True,
-        'writesubtitles': True,
-        'writeautomaticsub': False,
-        'subtitleslangs': ['zh-CN', 'zh-Hans', 'zh', 'chi', 'zh-Hant', 'zh-TW', 'en'],
-        'outtmpl': os.path.splitext(output_file_path)[0],
-        'quiet': False,
-    }
+    # Check if Chinese subtitles are available
+    subtitles = info.get('subtitles') or {}
     
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        info = ydl.extract_info(youtube_url, download=False)
-        
-        # Check if Chinese subtitles are available
-        subtitles = info.get('subtitles', {})
-        auto_subtitles = info.get('automatic_captions', {})
-        
-        # Look for various Chinese subtitle formats
-        chinese_subtitle_keys = ['zh-CN', 'zh-Hans', 'zh', 'chi']
-        
-        for key in chinese_subtitle_keys:
-            if key in subtitles:
-                print(f'找到中文字幕，正在下载...')
-                
-                # Set options to download the subtitles only
-                download_opts = {
-                    'skip_download': True,
-                    'writesubtitles': True,
-                    'subtitleslangs': [key],
-                    'subtitlesformat': 'vtt',
-                    'outtmpl': os.path.splitext(output_file_path)[0],
-                    'quiet': False,
-                }
-                
-                with yt_dlp.YoutubeDL(download_opts) as download_ydl:
-                    download_ydl.download([youtube_url])
+    # Look for various Chinese subtitle formats
+    chinese_subtitle_keys = ['zh-CN', 'zh-Hans', 'zh', 'chi']
+    
+    for key in chinese_subtitle_keys:
+        if key in subtitles:
+            print(f'找到中文字幕，正在下载...')
+            
+            # 视频信息中已经列出了字幕文件地址，优先直接下载VTT，不再经过yt-dlp
+            try:
+                vtt_content = _fetch_subtitle_text(subtitles[key])
+            except Exception as e:
+                logger.warning(f'直接下载字幕失败，改用yt-dlp下载: {str(e)}')
+                vtt_content = None
+            
+            if vtt_content is not None:
+                with open(output_file_path, 'wb', buffering=_WRITE_BUFFER_SIZE) as f:
+                    f.write(_vtt_to_text(vtt_content).encode('utf-8'))
+                print(f'已保存字幕到：{output_file_path}')
+                return True, output_file_path
+            
+            # Set options to download the subtitles only
+            download_opts = {
+                'skip_download': True,
+                'writesubtitles': True,
+                'subtitleslangs': [key],
+                'subtitlesformat': 'vtt',
+                'outtmpl': os.path.splitext(output_file_path)[0],
+                'quiet': False,
+            }
+            
+            # 直接使用已获取的视频信息下载字幕，不再重新请求YouTube解析页面
+            with yt_dlp.YoutubeDL(download_opts) as download_ydl:
+                download_ydl.process_ie_result(download_ydl.sanitize_info(info), download=True)
+            
+            # Find and rename the subtitle file
+            subtitle_path = f"{os.path.splitext(output_file_path)[0]}.{key}.vtt"
+            if os.path.exists(subtitle_path):
+                # Convert VTT to plaintext
+                text_content = convert_vtt_to_text(subtitle_path)
+                with open(output_file_path, 'wb', buffering=_WRITE_BUFFER_SIZE) as f:
+                    f.write(text_content.encode('utf-8'))
                 
-                # Find and rename the subtitle file
-                subtitle_path = f"{os.path.splitext(output_file_path)[0]}.{key}.vtt"
-                if os.path.exists(subtitle_path):
-                    # Convert VTT to plaintext
-                    text_content = convert_vtt_to_text(subtitle_path)
-                    with open(output_file_path, 'w', encoding='utf-8') as f:
-                        f.write(text_content)
-                    
-                    # Remove the VTT file
-                    os.remove(subtitle_path)
-                    print(f'已保存字幕到：{output_file_path}')
-                    return True, output_file_path
-        
-        print('没有找到可用的中文字幕')
-        return False, None
+                # Remove the VTT file
+                os.remove(subtitle_path)
+                print(f'已保存字幕到：{output_file_path}')
+                return True, output_file_path
+    
+    print('没有找到可用的中文字幕')
+    return False, None
 
 def convert_vtt_to_text(vtt_file):
     """Convert VTT subtitle file to plaintext with timestamps"""
-    import re
-    
     with open(vtt_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
+        return _vtt_to_text(f.read())
+
+def _vtt_to_text(content):
+    """Convert VTT subtitle content to plaintext with timestamps"""
     # Remove WebVTT header
     if content.startswith('WEBVTT'):
-        content = re.sub(r'^WEBVTT.*?\n\n', '', content, flags=re.DOTALL)
+        content = _WEBVTT_HEADER_RE.sub('', content, count=1)
     
     # Process subtitle blocks
-    lines = content.split('\n')
     result = []
-    timestamp_pattern = re.compile(r'(\d{2}:\d{2}:\d{2}\.\d{3}) --> (\d{2}:\d{2}:\d{2}\.\d{3})')
-    
-    i = 0
-    while i < len(lines):
-        match = timestamp_pattern.search(lines[i])
-        if match:
-            start_time = match.group(1)
-            end_time = match.group(2)
-            
-            # Skip the line with timestamp
-            i += 1
-            
-            # Collect all subsequent text lines until the next timestamp or empty line
-            text_lines = []
-            while i < len(lines) and not timestamp_pattern.search(lines[i]) and lines[i].strip():
-                text_lines.append(lines[i])
-                i += 1
-            
-            # Add the timestamp and text to the result
-            text = ' '.join(text_lines).strip()
-            if text:
-                result.append(f"[{start_time}] - [{end_time}] {text}\n")
-        else:
-            i += 1
+    for start_time, end_time, text_block in _VTT_CUE_RE.findall(content):
+        text = text_block.replace('\n', ' ').strip()
+        result.append(f"[{start_time}] - [{end_time}] {text}\n")
     
     return '\n'.join(result)
 
 def download_audio(youtube_url, output_path='audio.mp3'):
     """Download audio from YouTube URL and save to specified path"""
-    # 确保下载目录存在
-    if not os.path.exists(DOWNLOAD_DIR):
-        os.makedirs(DOWNLOAD_DIR)
-    
     # 提取文件名（不含扩展名）和新的完整路径
     filename = os.path.basename(os.path.splitext(output_path)[0])
     output_path = os.path.join(DOWNLOAD_DIR, filename)
@@ -259,6 +321,9 @@ def download_audio(youtube_url, output_path='audio.mp3'):
             'preferredcodec': 'mp3',
             'preferredquality': '192',
         }],
+        # 音频需要以MP3格式上传供用户下载，不能跳过编码；
+        # 使用LAME的快速编码模式，192kbps下音质差别可以忽略，但编码时间明显缩短
+        'postprocessor_args': {'extractaudio': ['-compression_level', '7']},
         'quiet': False,
     }
     
@@ -268,31 +333,91 @@ def download_audio(youtube_url, output_path='audio.mp3'):
     # 返回生成的带扩展名的文件路径
     return f"{output_path}.mp3"
 
-def transcribe_audio(audio_path, model_name='large-v3', use_gpu=True, num_threads=4):
+def _cuda_info():
+    """Return (available, compute capability) for GPU 0, probed once and cached; any probe error means no CUDA"""
+    global _CUDA_INFO
+    if _CUDA_INFO is None:
+        available, capability = False, (0, 0)
+        if torch is not None:
+            try:
+                available = torch.cuda.is_available()
+                if available:
+                    capability = torch.cuda.get_device_capability(0)
+            except Exception as e:
+                # 驱动不匹配、设备被占用等情况下按没有GPU处理，不影响模块导入
+                logger.warning(f'CUDA检测失败，使用CPU转录: {str(e)}')
+                available, capability = False, (0, 0)
+        _CUDA_INFO = (available, capability)
+    return _CUDA_INFO
+
+def _default_compute_type(device):
+    """Pick the compute type for the device: int8_float16 on Ampere or newer GPUs, float16 on older GPUs, int8 on CPU"""
+    if device != "cuda":
+        return "int8"
+    # Ampere（计算能力 8.x）及以上的 GPU 使用 int8 权重，显存占用和带宽大约减半
+    if _cuda_info()[1][0] >= 8:
+        return "int8_float16"
+    return "float16"
+
+def _collect_segments(segments, output_file=None):
     """
-    Transcribe audio using faster-whisper model with improved quality and performance
+    Consume the segment generator returned by transcribe()
     
-    Parameters:
-        audio_path: Path to audio file
-        model_name: Model quality ('tiny', 'base', 'small', 'medium', 'large-v2', 'large-v3')
-        use_gpu: Whether to use GPU acceleration if available
-        num_threads: Number of CPU threads to use when GPU is unavailable
+    With output_file, every segment is written to DOWNLOAD_DIR/output_file as soon as it is decoded
+    and the returned result holds subtitle_path instead of the segment list.
     """
-    logger.info(f'开始使用 faster-whisper {model_name} 模型转录音频: {audio_path}')
-    
-    # Configure device based on availability
-    import torch
-    compute_type = "float16" if use_gpu and torch.cuda.is_available() else "int8"
-    device = "cuda" if use_gpu and torch.cuda.is_available() else "cpu"
+    result = {
+        "text": "",
+        "segments": []
+    }
+    text_parts = []
     
-    logger.debug(f'转录配置: device={device}, compute_type={compute_type}, model={model_name}')
+    subtitle = None
+    if output_file:
+        result["subtitle_path"] = os.path.join(DOWNLOAD_DIR, output_file)
+        subtitle = open(result["subtitle_path"], 'wb', buffering=_WRITE_BUFFER_SIZE)
     
     try:
-        if device == "cuda":
-            logger.info('使用GPU加速转录')
-            print('使用GPU加速转录')
-            
-            # 记录GPU状态
+        for segment in segments:
+            text = segment.text.strip()
+            text_parts.append(text)
+            if subtitle:
+                # 边解码边写入，不在内存中保留全部段落
+                subtitle.write(_format_segment_line(segment.start, segment.end, text).encode('utf-8'))
+            else:
+                result["segments"].append({
+                    "start": segment.start,
+                    "end": segment.end,
+                    "text": text
+                })
+    finally:
+        if subtitle:
+            subtitle.close()
+    
+    result["text"] = " ".join(text_parts)
+    logger.info(f'转录完成，共生成 {len(text_parts)} 个段落')
+    return result
+
+def _transcribe_settings(use_gpu, compute_type):
+    """Return the (device, compute_type) pair transcribe_audio uses on this machine"""
+    device = "cuda" if use_gpu and _cuda_info()[0] else "cpu"
+    if compute_type is None:
+        compute_type = _default_compute_type(device)
+    return device, compute_type
+
+def preload_model(model_name='large-v3', use_gpu=True, num_threads=4, compute_type=None):
+    """Load the model transcribe_audio would use with the same arguments into the model cache"""
+    device, compute_type = _transcribe_settings(use_gpu, compute_type)
+    return _get_model(model_name, device, compute_type, num_threads if device == "cpu" else 0)
+
+def _transcribe_once(audio, model_name, device, compute_type, cpu_threads, output_file):
+    """Run a single transcription attempt on decoded audio with the given device settings"""
+    if device == "cuda":
+        logger.info('使用GPU加速转录')
+        print('使用GPU加速转录')
+        
+        # 记录GPU状态（需要查询CUDA驱动，只在输出DEBUG日志时执行）
+        if logger.isEnabledFor(logging.DEBUG):
             try:
                 gpu_info = torch.cuda.get_device_properties(0)
                 logger.debug(f'GPU信息: {gpu_info.name}, 总内存: {gpu_info.total_memory / 1024 / 1024 / 1024:.2f}GB')
@@ -303,275 +428,262 @@ def transcribe_audio(audio_path, model_name='large-v3', use_gpu=True, num_thread
                 logger.debug(f'当前GPU内存使用: 已分配 {allocated:.2f}GB, 已保留 {reserved:.2f}GB')
             except Exception as e:
                 logger.warning(f'无法获取GPU信息: {str(e)}')
-            
-            # Initialize the model with GPU settings
-            logger.debug('初始化WhisperModel(GPU模式)...')
-            model = WhisperModel(model_name, device=device, compute_type=compute_type)
-            logger.debug('WhisperModel初始化完成(GPU模式)')
-        else:
-            logger.info(f'使用CPU转录，线程数: {num_threads}')
-            print(f'使用CPU转录，线程数: {num_threads}')
-            
-            # Initialize the model with CPU settings
-            logger.debug('初始化WhisperModel(CPU模式)...')
-            model = WhisperModel(model_name, device="cpu", compute_type="int8", cpu_threads=num_threads)
-            logger.debug('WhisperModel初始化完成(CPU模式)')
-        
-        # 记录音频文件信息
+    else:
+        logger.info(f'使用CPU转录，线程数: {cpu_threads}')
+        print(f'使用CPU转录，线程数: {cpu_threads}')
+    
+    model = _get_model(model_name, device, compute_type, cpu_threads)
+    
+    # Transcribe the audio file
+    logger.info('开始转录...')
+    logger.debug('调用BatchedInferencePipeline.transcribe()...')
+    segments, info = BatchedInferencePipeline(model=model).transcribe(audio, **TRANSCRIBE_OPTIONS)
+    logger.debug(f'转录完成，语言检测结果: {info.language}, 语言置信度: {info.language_probability}')
+    
+    # Collect all segments to form the result
+    logger.debug('处理转录段落...')
+    result = _collect_segments(segments, output_file)
+    
+    # Log a preview of the transcription
+    if result["text"] and logger.isEnabledFor(logging.DEBUG):
+        preview_length = min(100, len(result["text"]))
+        logger.debug(f'转录文本预览: {result["text"][:preview_length]}...')
+    
+    return result
+
+def transcribe_audio(audio_path, model_name='large-v3', use_gpu=True, num_threads=4, compute_type=None, output_file=None):
+    """
+    Transcribe audio using faster-whisper model with improved quality and performance
+    
+    Parameters:
+        audio_path: Path to audio file
+        model_name: Model quality ('tiny', 'base', 'small', 'medium', 'large-v2', 'large-v3')
+        use_gpu: Whether to use GPU acceleration if available
+        num_threads: Number of CPU threads to use when GPU is unavailable
+        compute_type: CTranslate2 compute type, detected from the device when None
+        output_file: Write segments to this file in DOWNLOAD_DIR while transcribing instead of
+            returning them; the result then contains subtitle_path
+    """
+    logger.info(f'开始使用 faster-whisper {model_name} 模型转录音频: {audio_path}')
+    
+    # Configure device based on availability
+    device, compute_type = _transcribe_settings(use_gpu, compute_type)
+    
+    logger.debug(f'转录配置: device={device}, compute_type={compute_type}, model={model_name}')
+    
+    # 记录音频文件信息
+    if logger.isEnabledFor(logging.DEBUG):
         try:
-            import os
             audio_size = os.path.getsize(audio_path) / (1024 * 1024)
             logger.debug(f'音频文件大小: {audio_size:.2f}MB')
         except Exception as e:
             logger.warning(f'无法获取音频文件信息: {str(e)}')
-        
-        # Transcribe the audio file
-        logger.info('开始转录...')
-        logger.debug('调用model.transcribe()...')
-        segments, info = model.transcribe(audio_path, beam_size=5)
-        logger.debug(f'转录完成，语言检测结果: {info.language}, 语言置信度: {info.language_probability}')
-        
-        # Collect all segments to form the result
-        result = {
-            "text": "",
-            "segments": []
-        }
-        
-        segment_count = 0
-        
-        logger.debug('处理转录段落...')
-        for segment in segments:
-            segment_count += 1
-            result["text"] += segment.text + " "
-            result["segments"].append({
-                "start": segment.start,
-                "end": segment.end,
-                "text": segment.text.strip()
-            })
-        
-        # Trim the final resulting text
-        result["text"] = result["text"].strip()
-        logger.info(f'转录完成，共生成 {segment_count} 个段落')
-        
-        # Log a preview of the transcription
-        if result["text"]:
-            preview_length = min(100, len(result["text"]))
-            logger.debug(f'转录文本预览: {result["text"][:preview_length]}...')
-        
-        return result
-        
-    except (torch.cuda.OutOfMemoryError, RuntimeError) as e:
-        error_msg = str(e)
-        logger.error(f"CUDA/运行时错误: {error_msg}")
+    
+    # 只解码一次音频（16kHz单声道float32），GPU失败后用CPU重试时不需要再次解码
+    try:
+        audio = decode_audio(audio_path, sampling_rate=SAMPLING_RATE)
+    except Exception as e:
+        logger.error(f"音频解码失败: {str(e)}")
         logger.error(traceback.format_exc())
+        raise Exception(f"音频解码失败: {str(e)}") from e
+    logger.debug(f'音频时长: {len(audio) / SAMPLING_RATE:.1f}秒')
+    
+    # 先使用检测到的设备转录；GPU出错（例如显存不足）时用CPU重试一次
+    attempts = [(device, compute_type, num_threads if device == "cpu" else 0)]
+    if device == "cuda":
+        attempts.append(("cpu", "int8", num_threads))
+    
+    for attempt, (attempt_device, attempt_compute_type, cpu_threads) in enumerate(attempts):
+        try:
+            return _transcribe_once(audio, model_name, attempt_device, attempt_compute_type, cpu_threads, output_file)
         
-        # Check if error is CUDA out of memory
-        if "CUDA out of memory" in error_msg or "CUDA error" in error_msg:
-            logger.warning("GPU内存不足，将切换到CPU模式")
+        except RuntimeError as e:
+            # torch.cuda.OutOfMemoryError 也是 RuntimeError 的子类
+            error_msg = str(e)
+            logger.error(f"CUDA/运行时错误: {error_msg}")
+            logger.error(traceback.format_exc())
             
-            # If we failed with GPU, try again with CPU
-            if device == "cuda":
-                logger.info(f'重试: 使用CPU转录，线程数: {num_threads}')
-                
-                try:
-                    model = WhisperModel(model_name, device="cpu", compute_type="int8", cpu_threads=num_threads)
-                    logger.debug('CPU模式模型初始化完成，开始转录...')
-                    
-                    # Transcribe the audio file
-                    segments, info = model.transcribe(audio_path, beam_size=5)
-                    logger.debug(f'CPU模式转录完成，语言: {info.language}')
-                    
-                    # Collect all segments to form the result
-                    result = {
-                        "text": "",
-                        "segments": []
-                    }
-                    
-                    for segment in segments:
-                        result["text"] += segment.text + " "
-                        result["segments"].append({
-                            "start": segment.start,
-                            "end": segment.end,
-                            "text": segment.text.strip()
-                        })
-                    
-                    # Trim the final resulting text
-                    result["text"] = result["text"].strip()
-                    logger.info('CPU模式转录成功')
-                    
-                    return result
-                except Exception as cpu_e:
-                    logger.error(f"CPU模式转录也失败: {str(cpu_e)}")
-                    logger.error(traceback.format_exc())
-                    raise
+            # Check if error is CUDA out of memory
+            cuda_error = "CUDA out of memory" in error_msg or "CUDA error" in error_msg
+            if not (cuda_error and attempt_device == "cuda" and attempt + 1 < len(attempts)):
+                # Re-raise the exception with more info
+                raise Exception(f"转录失败: {error_msg}") from e
+            logger.warning("GPU内存不足，将切换到CPU模式")
         
-        # Re-raise the exception with more info
-        raise Exception(f"转录失败: {error_msg}") from e
-    
-    except Exception as e:
-        logger.error(f"转录过程中出现未知错误: {str(e)}")
-        logger.error(traceback.format_exc())
-        raise Exception(f"转录过程中未知错误: {str(e)}") from e
+        except Exception as e:
+            logger.error(f"转录过程中出现未知错误: {str(e)}")
+            logger.error(traceback.format_exc())
+            raise Exception(f"转录过程中未知错误: {str(e)}") from e
+        
+        # 离开except后异常及其引用的模型才会释放，此时再从缓存中移除GPU模型并清理显存
+        with _MODEL_LOCK:
+            _MODEL_CACHE.pop((model_name, attempt_device, attempt_compute_type, 0), None)
+        torch.cuda.empty_cache()
+        logger.info(f'重试: 使用CPU转录，线程数: {num_threads}')
 
 def save_transcription(result, filename):
     """Save transcription to a text file with timestamps in format [HH:MM:SS.mmm]"""
     # 确保文件名包含完整路径
     filepath = os.path.join(DOWNLOAD_DIR, filename)
     
-    # 确保下载目录存在
-    if not os.path.exists(DOWNLOAD_DIR):
-        os.makedirs(DOWNLOAD_DIR)
-    
-    with open(filepath, 'w', encoding='utf-8') as f:
-        # Process each segment with its timestamp
-        for segment in result["segments"]:
-            # Format timestamps as [HH:MM:SS.mmm]
-            start_time = format_timestamp(segment["start"])
-            end_time = format_timestamp(segment["end"])
-            
-            # Write timestamp range and text
-            f.write(f"[{start_time}] - [{end_time}] {segment['text']}\n\n")
+    # 先拼接全部段落，整体编码后一次写入
+    content = ''.join(
+        _format_segment_line(segment["start"], segment["end"], segment["text"])
+        for segment in result["segments"]
+    )
+    with open(filepath, 'wb', buffering=_WRITE_BUFFER_SIZE) as f:
+        f.write(content.encode('utf-8'))
     
     print(f'带时间戳的转录已保存到: {filepath}')
     return filepath
 
+def _format_segment_line(start, end, text):
+    """Format one transcription segment as '[HH:MM:SS.mmm] - [HH:MM:SS.mmm] text' followed by a blank line"""
+    return f"[{format_timestamp(start)}] - [{format_timestamp(end)}] {text}\n\n"
+
 def format_timestamp(seconds):
     """Convert seconds to HH:MM:SS.mmm format"""
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    seconds_remainder = seconds % 60
-    milliseconds = int((seconds_remainder % 1) * 1000)
-    return f"{hours:02d}:{minutes:02d}:{int(seconds_remainder):02d}.{milliseconds:03d}"
+    # 先换算成整数毫秒再拆分，全部使用整数运算；
+    # 四舍五入也避免了 1.16 秒这类浮点误差被截断成 .159
+    hours, remainder = divmod(round(seconds * 1000), 3600000)
+    minutes, remainder = divmod(remainder, 60000)
+    whole_secs, milliseconds = divmod(remainder, 1000)
+    return f"{hours:02d}:{minutes:02d}:{whole_secs:02d}.{milliseconds:03d}"
 
-def process_youtube_video(youtube_url):
+# 转录使用的模型
+TRANSCRIBE_MODEL = 'large-v3'
+
+def _download_stage(youtube_url):
     """
-    Process a YouTube video: extract info, download audio, generate transcription
+    First half of process_youtube_video: fetch info, look for Chinese subtitles and download the audio
     
-    Parameters:
-        youtube_url: URL of the YouTube video
-        
     Returns:
-        dict: A dictionary containing:
-            - title: Video title
-            - description: Video description
-            - audio_path: Path to the downloaded audio file
-            - subtitle_path: Path to the generated subtitle file
+        tuple: (result, pending) where pending holds the arguments for _transcribe_stage,
+            or None when subtitles were found and no transcription is needed
     """
-    logger.info(f"开始处理YouTube视频: {youtube_url}")
+    # 下载目录在导入时已创建；DOWNLOAD_DIR 可能被调用方改为其他目录（例如任务客户端的临时目录），
+    # 每个视频开始时确认一次，后续步骤不再检查
+    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
     
-    # 确保下载目录存在
-    if not os.path.exists(DOWNLOAD_DIR):
-        os.makedirs(DOWNLOAD_DIR)
-        logger.debug(f"创建下载目录: {DOWNLOAD_DIR}")
+    # Get video info first
+    logger.info("正在获取视频信息...")
+    video_info = get_video_info(youtube_url)
+    raw_title = video_info['title']
+    description = video_info['description']
+    logger.info(f"获取到视频信息 - 标题: {raw_title}")
+    logger.debug(f"视频描述: {description[:100]}..." if len(description) > 100 else description)
     
-    try:
-        # Get video info first
-        logger.info("正在获取视频信息...")
-        video_info = get_video_info(youtube_url)
-        raw_title = video_info['title']
-        description = video_info['description']
-        logger.info(f"获取到视频信息 - 标题: {raw_title}")
-        logger.debug(f"视频描述: {description[:100]}..." if len(description) > 100 else description)
-        
-        # Get sanitized video title for filenames
-        video_title = get_video_title(youtube_url)
-        subtitle_file = f"{video_title}.txt"
-        logger.debug(f"生成的文件名: {video_title}")
+    # Get sanitized video title for filenames
+    video_title = get_video_title(youtube_url, video_info['raw_info'])
+    subtitle_file = f"{video_title}.txt"
+    logger.debug(f"生成的文件名: {video_title}")
+    
+    result = {
+        'title': raw_title,
+        'description': description,
+        'audio_path': None,
+        'subtitle_path': None
+    }
+    
+    # First check if Chinese subtitles are available
+    logger.info("检查是否有中文字幕...")
+    subtitles_downloaded, subtitle_path = check_and_download_subtitles(youtube_url, subtitle_file, video_info['raw_info'])
+    if subtitles_downloaded:
+        logger.info(f"成功下载中文字幕到: {subtitle_path}")
+        result['subtitle_path'] = subtitle_path
         
-        result = {
-            'title': raw_title,
-            'description': description,
-            'audio_path': None,
-            'subtitle_path': None
-        }
+        # 如果没有下载音频，也需要下载音频文件
+        logger.info("下载音频文件...")
+        audio_file = f"{video_title}"
+        audio_path = download_audio(youtube_url, audio_file)
+        logger.info(f"音频下载完成: {audio_path}")
+        result['audio_path'] = audio_path
         
-        # First check if Chinese subtitles are available
-        logger.info("检查是否有中文字幕...")
-        subtitles_downloaded, subtitle_path = check_and_download_subtitles(youtube_url, subtitle_file)
-        if subtitles_downloaded:
-            logger.info(f"成功下载中文字幕到: {subtitle_path}")
-            result['subtitle_path'] = subtitle_path
-            
-            # 如果没有下载音频，也需要下载音频文件
-            logger.info("下载音频文件...")
-            audio_file = f"{video_title}"
-            audio_path = download_audio(youtube_url, audio_file)
-            logger.info(f"音频下载完成: {audio_path}")
-            result['audio_path'] = audio_path
-            
-            return result
+        return result, None
 
-        # No subtitles found, proceed with audio download and transcription
-        logger.info("没有找到中文字幕，将进行音频下载和转录")
+    # No subtitles found, proceed with audio download and transcription
+    logger.info("没有找到中文字幕，将进行音频下载和转录")
+    
+    # 使用视频标题作为音频文件名
+    audio_file = f"{video_title}"
+    
+    # 下载音频的同时在后台加载转录模型，模型加载时间被下载时间覆盖
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        model_future = executor.submit(preload_model, TRANSCRIBE_MODEL)
         
-        # 使用视频标题作为音频文件名
-        audio_file = f"{video_title}"
         logger.info(f"开始下载音频: {youtube_url} -> {audio_file}")
         audio_path = download_audio(youtube_url, audio_file)
         logger.info(f"音频下载完成: {audio_path}")
         result['audio_path'] = audio_path
-
-        logger.info("开始转录过程...")
+        
         try:
-            # 首先尝试使用大模型
-            logger.info("尝试使用 large-v3 模型转录")
-            try:
-                transcription_result = transcribe_audio(audio_path, model_name='large-v3')
-                logger.info("large-v3 模型转录成功")
-            except Exception as e1:
-                logger.warning(f"large-v3 模型转录失败: {str(e1)}")
-                logger.info("尝试使用 medium 模型转录")
-                
-                try:
-                    transcription_result = transcribe_audio(audio_path, model_name='medium')
-                    logger.info("medium 模型转录成功")
-                except Exception as e2:
-                    logger.warning(f"medium 模型转录失败: {str(e2)}")
-                    logger.info("尝试使用 small 模型转录")
-                    
-                    try:
-                        transcription_result = transcribe_audio(audio_path, model_name='small')
-                        logger.info("small 模型转录成功")
-                    except Exception as e3:
-                        logger.warning(f"small 模型转录失败: {str(e3)}")
-                        logger.info("最后尝试使用 base 模型转录")
-                        
-                        # 最后尝试最小的模型
-                        transcription_result = transcribe_audio(audio_path, model_name='base')
-                        logger.info("base 模型转录成功")
-            
-            logger.info("转录完成，保存转录结果...")
-            
-            # Save transcription to file
-            subtitle_path = save_transcription(transcription_result, subtitle_file)
-            logger.info(f"转录结果已保存到: {subtitle_path}")
-            result['subtitle_path'] = subtitle_path
-            
-            # Print a preview of the transcription
-            preview_length = min(150, len(transcription_result["text"]))
-            preview_text = transcription_result["text"][:preview_length] + "..." if len(transcription_result["text"]) > preview_length else transcription_result["text"]
-            logger.info(f"转录文本预览: {preview_text}")
-            
-            return result
-            
+            model_future.result()
         except Exception as e:
-            error_message = f"转录过程中出现错误: {str(e)}"
-            logger.error(error_message)
-            logger.error(traceback.format_exc())
-            
-            # 创建一个简单的字幕文件，即使转录失败也能返回一些结果
-            logger.info("生成简单的错误信息字幕文件...")
-            simple_subtitle_path = os.path.join(DOWNLOAD_DIR, subtitle_file)
-            with open(simple_subtitle_path, 'w', encoding='utf-8') as f:
-                f.write(f"[自动生成] 该视频转录失败，但音频已成功下载。\n")
-                f.write(f"错误信息: {str(e)}\n")
-                f.write(f"处理时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write(f"视频标题: {raw_title}\n")
-                
-            result['subtitle_path'] = simple_subtitle_path
-            logger.info(f"生成简单字幕文件: {simple_subtitle_path}")
+            # 预加载失败不影响后续流程，转录时会重新加载并处理显存不足等错误
+            logger.warning(f"预加载 {TRANSCRIBE_MODEL} 模型失败: {str(e)}")
+    
+    return result, {'audio_path': audio_path, 'subtitle_file': subtitle_file}
+
+def _transcribe_stage(result, audio_path, subtitle_file):
+    """Second half of process_youtube_video: transcribe the downloaded audio and fill in subtitle_path"""
+    logger.info("开始转录过程...")
+    try:
+        # 只使用 large-v3 模型转录一次；显存不足时 transcribe_audio 内部会切换到CPU，
+        # 其他错误不再依次换用更小的模型重试，直接生成错误信息字幕
+        logger.info(f"使用 {TRANSCRIBE_MODEL} 模型转录")
+        transcription_result = transcribe_audio(audio_path, model_name=TRANSCRIBE_MODEL, output_file=subtitle_file)
+        logger.info(f"{TRANSCRIBE_MODEL} 模型转录成功")
+        
+        # 转录过程中段落已直接写入字幕文件
+        subtitle_path = transcription_result['subtitle_path']
+        logger.info(f"转录结果已保存到: {subtitle_path}")
+        result['subtitle_path'] = subtitle_path
+        
+        # Print a preview of the transcription
+        preview_length = min(150, len(transcription_result["text"]))
+        preview_text = transcription_result["text"][:preview_length] + "..." if len(transcription_result["text"]) > preview_length else transcription_result["text"]
+        logger.info(f"转录文本预览: {preview_text}")
+        
+    except Exception as e:
+        error_message = f"转录过程中出现错误: {str(e)}"
+        logger.error(error_message)
+        logger.error(traceback.format_exc())
+        
+        # 创建一个简单的字幕文件，即使转录失败也能返回一些结果
+        logger.info("生成简单的错误信息字幕文件...")
+        simple_subtitle_path = os.path.join(DOWNLOAD_DIR, subtitle_file)
+        with open(simple_subtitle_path, 'w', encoding='utf-8') as f:
+            f.write(f"[自动生成] 该视频转录失败，但音频已成功下载。\n")
+            f.write(f"错误信息: {str(e)}\n")
+            f.write(f"处理时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            f.write(f"视频标题: {result['title']}\n")
             
+        result['subtitle_path'] = simple_subtitle_path
+        logger.info(f"生成简单字幕文件: {simple_subtitle_path}")
+    
+    return result
+
+def process_youtube_video(youtube_url):
+    """
+    Process a YouTube video: extract info, download audio, generate transcription
+    
+    Parameters:
+        youtube_url: URL of the YouTube video
+        
+    Returns:
+        dict: A dictionary containing:
+            - title: Video title
+            - description: Video description
+            - audio_path: Path to the downloaded audio file
+            - subtitle_path: Path to the generated subtitle file
+    """
+    logger.info(f"开始处理YouTube视频: {youtube_url}")
+    
+    try:
+        result, pending = _download_stage(youtube_url)
+        if pending is None:
             return result
+        return _transcribe_stage(result, **pending)
             
     except Exception as e:
         # 捕获整个处理过程中的任何错误
@@ -581,7 +693,60 @@ def process_youtube_video(youtube_url):
         # 重新抛出异常以便上层函数处理
         raise Exception(f"处理YouTube视频失败: {str(e)}")
 
+def process_youtube_videos(youtube_urls):
+    """
+    Process several YouTube videos, downloading the next videos while the current one is transcribed
+    
+    Parameters:
+        youtube_urls: List of YouTube video URLs
+    
+    Returns:
+        list: One entry per URL in the same order, the process_youtube_video result or None if it failed
+    """
+    results = [None] * len(youtube_urls)
+    # 下载线程最多领先转录两个视频，避免音频文件在磁盘上堆积
+    downloaded = queue.Queue(maxsize=2)
+    
+    def download_all():
+        for index, youtube_url in enumerate(youtube_urls):
+            logger.info(f"开始处理YouTube视频 ({index + 1}/{len(youtube_urls)}): {youtube_url}")
+            try:
+                downloaded.put((index, _download_stage(youtube_url)))
+            except Exception as e:
+                logger.error(f"处理视频时发生意外错误: {youtube_url} - {str(e)}")
+                logger.error(traceback.format_exc())
+        downloaded.put(None)
+    
+    downloader = threading.Thread(target=download_all, daemon=True)
+    downloader.start()
+    
+    # 当前线程依次转录，与下载线程的网络I/O重叠
+    while True:
+        item = downloaded.get()
+        if item is None:
+            break
+        index, (result, pending) = item
+        if pending is not None:
+            _transcribe_stage(result, **pending)
+        results[index] = result
+    
+    downloader.join()
+    return results
+
 def main():
+    # 命令行传入多个链接时批量处理，否则提示输入单个链接
+    if len(sys.argv) > 1:
+        results = process_youtube_videos(sys.argv[1:])
+        for youtube_url, result in zip(sys.argv[1:], results):
+            print(f"\n{youtube_url}")
+            if result is None:
+                print("处理失败")
+                continue
+            print(f"标题: {result['title']}")
+            print(f"音频文件: {result['audio_path']}")
+            print(f"字幕文件: {result['subtitle_path']}")
+        return
+    
     youtube_url = input('请输入YouTube视频链接: ').strip()
     result = process_youtube_video(youtube_url)
     